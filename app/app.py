@@ -1,14 +1,71 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
 
-from app.endpoints import auth, todos, users
+from fastapi import Depends, FastAPI
 
-app = FastAPI()
+from app.compression import CompressionMiddleware
+from app.db import database
+from app.endpoints import auth, health, internal, metrics, todos, users
+from app.metrics import MetricsMiddleware, instrument_pool
+from app.profiling import ProfilerMiddleware
+from app.ratelimit import rate_limit
+from app.settings import Settings, get_settings
+from app.warmup import warm_up
 
-app.include_router(users.router, prefix='/v1')
-app.include_router(auth.router, prefix='/v1')
-app.include_router(todos.router, prefix='/v1')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warms up in the background, so liveness answers right away and
+    readiness once it is done. Closes the connections on shutdown."""
+    app.state.warmup = asyncio.create_task(warm_up(app, app.state.settings))
+    try:
+        yield
+    finally:
+        app.state.warmup.cancel()
+        router = database.replica_router
+        for db_engine in (router.primary, *router.replicas):
+            await db_engine.dispose()
 
 
-@app.get('/')
 def read_root():
     return {'message': 'Hello World!'}
+
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    """Builds the application, also servable with
+    `uvicorn --factory app.app:create_app`."""
+    settings = settings or get_settings()
+
+    app = FastAPI(dependencies=[Depends(rate_limit)], lifespan=lifespan)
+    app.state.settings = settings
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        encodings=settings.COMPRESSION_ENCODINGS,
+        levels={
+            'zstd': settings.COMPRESSION_ZSTD_LEVEL,
+            'br': settings.COMPRESSION_BROTLI_QUALITY,
+            'gzip': settings.COMPRESSION_GZIP_LEVEL,
+        },
+    )
+    # Added last so they are outermost and time compression too. The
+    # profiler must wrap the metrics, which read its query counts.
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(ProfilerMiddleware, settings=settings)
+    router = database.replica_router
+    for db_engine in (router.primary, *router.replicas):
+        instrument_pool(db_engine)
+
+    app.include_router(users.router, prefix='/v1')
+    app.include_router(auth.router, prefix='/v1')
+    app.include_router(todos.router, prefix='/v1')
+    app.include_router(health.router, include_in_schema=False)
+    app.include_router(internal.router, include_in_schema=False)
+    app.include_router(metrics.router, include_in_schema=False)
+    app.get('/')(read_root)
+
+    return app
+
+
+settings = get_settings()
+app = create_app(settings)
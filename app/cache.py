@@ -0,0 +1,150 @@
+"""In-process caches, and the backends of the todo list result cache.
+
+Result cache backends store byte strings under string keys and have
+async `get(key)` and `set(key, value)`. `MemoryBackend` keeps them in
+the process, `RedisBackend` in a Redis server shared by every worker.
+"""
+
+import logging
+from collections import OrderedDict
+from time import monotonic
+
+try:
+    from redis.asyncio import Redis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover
+    Redis = None
+    RedisError = OSError
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """In-process mapping whose entries expire `ttl` seconds after being
+    set. Once `maxsize` entries are stored, the least recently used one is
+    evicted.
+
+    Being per process, an entry removed by one worker stays visible to the
+    others until it expires; keep `ttl` short where that matters.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+
+        if item is None:
+            return default
+
+        value, expires_at = item
+        if expires_at < monotonic():
+            self._data.pop(key, None)
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = (value, monotonic() + self.ttl)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class MemoryBackend:
+    """LRU of byte strings expiring `ttl` seconds after being set, bounded
+    by both entry count and total size."""
+
+    def __init__(self, ttl: float, maxsize: int, max_bytes: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        value, expires_at = item
+        if expires_at < monotonic():
+            self._remove(key)
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes):
+        self._remove(key)
+        if len(value) > self.max_bytes:
+            return
+
+        self._data[key] = (value, monotonic() + self.ttl)
+        self.size += len(value)
+
+        while len(self._data) > self.maxsize or self.size > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.size -= len(item[0])
+
+
+class RedisBackend:
+    """Entries in Redis, or anything speaking its protocol, under
+    `prefix`. Redis evicts them after `ttl` seconds.
+
+    The cache is an optimization, so a Redis error is logged and taken as
+    a miss rather than failing the request.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = 'todos-cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float):
+        if Redis is None:  # pragma: no cover
+            raise RuntimeError('The redis package is needed for CACHE_URL.')
+        return cls(Redis.from_url(url), ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(self.prefix + key)
+        except RedisError:
+            logger.warning('Cache read failed', exc_info=True)
+            return None
+
+    async def set(self, key: str, value: bytes):
+        try:
+            await self.client.set(
+                self.prefix + key, value, px=int(self.ttl * 1000)
+            )
+        except RedisError:
+            logger.warning('Cache write failed', exc_info=True)
+
+
+def create_backend(settings):
+    """The result cache backend picked by `CACHE_BACKEND`, or None."""
+    if settings.CACHE_BACKEND == 'redis':
+        return RedisBackend.from_url(settings.CACHE_URL, settings.CACHE_TTL)
+    if settings.CACHE_BACKEND == 'memory':
+        return MemoryBackend(
+            settings.CACHE_TTL,
+            settings.CACHE_MAXSIZE,
+            settings.CACHE_MAX_BYTES,
+        )
+    return None
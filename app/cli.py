@@ -0,0 +1,119 @@
+"""Maintenance commands.
+
+python -m app.cli reconcile-counters [--user-id ID]
+python -m app.cli seed --users N --todos N [--workers N] [--seed N] ...
+"""
+
+import argparse
+import os
+from dataclasses import replace
+from time import perf_counter
+
+from sqlalchemy.orm import Session
+
+from app.counters import reconcile_counts
+from app.db.database import engine
+from app.models.todos import ToDoStatus
+from app.seeding import PASSWORD, SeedPlan, seed
+
+
+def reconcile_counters(args):
+    with Session(engine) as session:
+        drifted = reconcile_counts(session, args.user_id)
+
+    for user_id, status, stored, actual in drifted:
+        print(f'user {user_id} {status.value}: {stored} -> {actual}')
+    print(f'{len(drifted)} counters fixed')
+
+
+def status_weights(value: str) -> dict[ToDoStatus, float]:
+    """'todo=3,doing=1' as {ToDoStatus.todo: 3, ToDoStatus.doing: 1}."""
+    try:
+        return {
+            ToDoStatus(status.strip()): float(weight)
+            for status, weight in (
+                item.split('=') for item in value.split(',')
+            )
+        }
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(
+            f'expected status=weight pairs, got {value!r}'
+        ) from exc
+
+
+def seed_data(args):
+    plan = SeedPlan(
+        users=args.users,
+        todos=args.todos,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        title_length=tuple(args.title_length),
+        description_length=tuple(args.description_length),
+        skew=args.skew,
+    )
+    if args.statuses:
+        plan = replace(plan, statuses=args.statuses)
+
+    start = perf_counter()
+    plan = seed(engine, plan, args.workers)
+
+    print(
+        f'{plan.users} users from id {plan.first_user_id}, '
+        f'{plan.todos} todos from id {plan.first_todo_id} '
+        f'in {perf_counter() - start:.1f}s'
+    )
+    print(f'users log in with the password {PASSWORD!r}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(required=True)
+
+    reconcile = commands.add_parser(
+        'reconcile-counters',
+        help='rebuild the todo counters from the todos',
+    )
+    reconcile.add_argument('--user-id', type=int)
+    reconcile.set_defaults(func=reconcile_counters)
+
+    seeding = commands.add_parser(
+        'seed', help='load synthetic users and todos, see app/seeding.py'
+    )
+    seeding.add_argument('--users', type=int, required=True)
+    seeding.add_argument('--todos', type=int, required=True)
+    seeding.add_argument('--seed', type=int, default=0)
+    seeding.add_argument('--workers', type=int, default=os.cpu_count())
+    seeding.add_argument('--batch-size', type=int, default=10_000)
+    seeding.add_argument(
+        '--statuses',
+        type=status_weights,
+        help='relative weights, e.g. todo=3,doing=1,completed=6',
+    )
+    seeding.add_argument(
+        '--title-length',
+        type=int,
+        nargs=2,
+        default=(10, 60),
+        metavar=('MIN', 'MAX'),
+    )
+    seeding.add_argument(
+        '--description-length',
+        type=int,
+        nargs=2,
+        default=(20, 200),
+        metavar=('MIN', 'MAX'),
+    )
+    seeding.add_argument(
+        '--skew',
+        type=float,
+        default=0,
+        help='0 spreads todos evenly among users, 1+ favours the first',
+    )
+    seeding.set_defaults(func=seed_data)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Response compression negotiated through Accept-Encoding.
+
+zstd and brotli are used when their optional packages are installed,
+gzip is always available. Bodies sent in one piece are compressed only
+from `minimum_size` bytes on; streamed bodies are compressed chunk by
+chunk and flushed each time, so clients still get rows as they come.
+"""
+
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# In order of preference when the client has none.
+COMPRESSORS = {
+    name: compressor
+    for name, compressor, available in (
+        ('zstd', ZstdCompressor, zstandard is not None),
+        ('br', BrotliCompressor, brotli is not None),
+        ('gzip', GzipCompressor, True),
+    )
+    if available
+}
+
+
+def negotiate_encoding(accept_encoding: str, encodings) -> str | None:
+    """Picks the encoding the client weighs highest among `encodings`,
+    breaking ties by the order of `encodings`."""
+    weights = {}
+
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best = None
+    best_weight = 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        levels: dict[str, int] | None = None,
+        encodings=None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {'zstd': 3, 'br': 4, 'gzip': 6, **(levels or {})}
+        self.encodings = [
+            encoding
+            for encoding in (encodings or COMPRESSORS)
+            if encoding in COMPRESSORS
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get('accept-encoding', ''), self.encodings
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(
+            send,
+            encoding,
+            lambda: COMPRESSORS[encoding](self.levels[encoding]),
+            self.minimum_size,
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, send, encoding, make_compressor, minimum_size):
+        self._send = send
+        self.encoding = encoding
+        self.make_compressor = make_compressor
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            headers = Headers(raw=message['headers'])
+            status = message['status']
+            # Already encoded, or a status without a body.
+            self.passthrough = 'content-encoding' in headers or status in {
+                204,
+                304,
+            }
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message['type'] != 'http.response.body':  # pragma: no cover
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = self.make_compressor()
+            headers = MutableHeaders(raw=self.start_message['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+
+            if not more_body:
+                body = (
+                    self.compressor.compress(body) + self.compressor.finish()
+                )
+                headers['Content-Length'] = str(len(body))
+                await self._send(self.start_message)
+                await self._send({'type': 'http.response.body', 'body': body})
+                return
+
+            del headers['Content-Length']
+            await self._send(self.start_message)
+
+        body = self.compressor.compress(body)
+        if not more_body:
+            body += self.compressor.finish()
+
+        await self._send({
+            'type': 'http.response.body',
+            'body': body,
+            'more_body': more_body,
+        })
@@ -0,0 +1,106 @@
+"""Per-user todo counts by status.
+
+`todo_counters` holds one row per user and status. Every todo write
+applies its deltas with `add_counts` in the same transaction, so the
+stats endpoint reads a handful of rows instead of grouping the todos.
+`reconcile_counts` rebuilds them from the todos should they ever drift,
+see `python -m app.cli reconcile-counters`.
+"""
+
+from collections import Counter
+from collections.abc import Iterable, Mapping
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.todos import ToDo, ToDoCounter, ToDoStatus
+
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def count_deltas(
+    added: Iterable[ToDoStatus] = (), removed: Iterable[ToDoStatus] = ()
+) -> Counter:
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    return deltas
+
+
+async def add_counts(
+    session: AsyncSession, user_id: int, deltas: Mapping[ToDoStatus, int]
+):
+    """Adds `deltas` to the user's counters with one INSERT ... ON
+    CONFLICT DO UPDATE."""
+    rows = [
+        {'user_id': user_id, 'status': status, 'count': delta}
+        for status, delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+
+    upsert = UPSERTS[session.bind.dialect.name](ToDoCounter).values(rows)
+    await session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[ToDoCounter.user_id, ToDoCounter.status],
+            set_={'count': ToDoCounter.count + upsert.excluded.count},
+        )
+    )
+
+
+async def read_counts(session: AsyncSession, user_id: int) -> dict:
+    """The user's todo count for every status."""
+    counts = dict.fromkeys(ToDoStatus, 0)
+    rows = await session.execute(
+        select(ToDoCounter.status, ToDoCounter.count).where(
+            ToDoCounter.user_id == user_id
+        )
+    )
+    counts.update(rows.tuples().all())
+    return counts
+
+
+def reconcile_counts(session: Session, user_id: int | None = None):
+    """Rebuilds the counters of `user_id`, or of every user, from the
+    todos. Returns the (user_id, status, stored, actual) that were off.
+
+    On Postgres the counters are locked first: writes that already
+    touched them are waited for and later ones wait, so none is lost
+    between counting and rewriting.
+    """
+    if session.bind.dialect.name == 'postgresql':
+        session.execute(text('LOCK TABLE todo_counters IN EXCLUSIVE MODE'))
+
+    actual = select(ToDo.user_id, ToDo.status, func.count()).group_by(
+        ToDo.user_id, ToDo.status
+    )
+    stored = select(ToDoCounter.user_id, ToDoCounter.status, ToDoCounter.count)
+    clear = delete(ToDoCounter)
+    if user_id is not None:
+        actual = actual.where(ToDo.user_id == user_id)
+        stored = stored.where(ToDoCounter.user_id == user_id)
+        clear = clear.where(ToDoCounter.user_id == user_id)
+
+    actual_counts = {
+        (user, status): count
+        for user, status, count in session.execute(actual)
+    }
+    stored_counts = {
+        (user, status): count
+        for user, status, count in session.execute(stored)
+    }
+    drifted = []
+    for key in sorted(actual_counts.keys() | stored_counts.keys()):
+        before, after = stored_counts.get(key, 0), actual_counts.get(key, 0)
+        if before != after:
+            drifted.append((*key, before, after))
+
+    session.execute(clear)
+    session.execute(
+        insert(ToDoCounter).from_select(['user_id', 'status', 'count'], actual)
+    )
+    session.commit()
+
+    return drifted
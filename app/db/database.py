@@ -1,11 +1,198 @@
+from threading import Lock
+from time import perf_counter
+
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.db.routing import SAFE_METHODS, ReplicaRouter
+from app.settings import Settings, get_settings
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+psycopg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def get_async_url(url: str) -> str:
+    """Returns `url` pointing to a driver usable by the async engine."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+
+    if driver is None or parsed.drivername == 'postgresql+psycopg':
+        return url
+
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+class PoolWaits:
+    """How long checkouts waited for a connection, shared by a pool and
+    the pools it is recreated as.
+
+    `listeners` are called with the seconds waited and whether the
+    checkout timed out.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.listeners = []
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+        for listener in self.listeners:
+            listener(seconds, timed_out)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that times every checkout.
+
+    The time includes opening a new connection when the pool has room,
+    so a slow connect shows up here just like waiting on a full pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = PoolWaits()
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.waits.record(perf_counter() - start, timed_out=True)
+            raise
+        self.waits.record(perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.waits = self.waits
+        return pool
+
+
+def pool_stats(pool) -> dict:
+    """Occupancy and checkout waits of `pool`, for the internal endpoint.
+
+    Pools other than a queue pool, like SQLite's, only report their
+    class.
+    """
+    stats = {'pool': type(pool).__name__}
+
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return stats
+
+    stats.update(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        max_overflow=pool._max_overflow,
+    )
+    waits = getattr(pool, 'waits', None)
+    if waits is not None:
+        stats.update(
+            checkouts=waits.checkouts,
+            timeouts=waits.timeouts,
+            wait_seconds_total=round(waits.total, 6),
+            wait_seconds_max=round(waits.max, 6),
+            wait_seconds_avg=round(waits.total / (waits.checkouts or 1), 6),
+        )
+
+    return stats
+
+
+def engine_options(url: str, settings: Settings) -> dict:
+    """Pool and connection arguments for an engine on `url`.
+
+    SQLite keeps SQLAlchemy's defaults. The statement timeout and
+    prepared statements only apply to Postgres and psycopg respectively.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == 'sqlite':
+        return {}
+
+    connect_args = {}
+    if (
+        parsed.get_backend_name() == 'postgresql'
+        and settings.DB_STATEMENT_TIMEOUT_MS > 0
+    ):
+        connect_args['options'] = (
+            f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}'
+        )
+    if parsed.get_driver_name() == 'psycopg':
+        # psycopg prepares a statement server side once it has run this
+        # many times on a connection, so the hot lookups are parsed and
+        # planned once per connection.
+        connect_args['prepare_threshold'] = (
+            settings.DB_PREPARE_THRESHOLD
+            if settings.DB_PREPARE_THRESHOLD >= 0
+            else None
+        )
+
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'connect_args': connect_args,
+    }
+
+
+settings = get_settings()
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    **engine_options(settings.DATABASE_URL, settings),
+)
+
+
+def create_app_engine(url: str):
+    """Async engine serving requests on `url`, pooled per the settings."""
+    options = engine_options(url, settings)
+    if options:
+        options['poolclass'] = InstrumentedPool
+    return create_async_engine(url, **options)
+
 
-from app.settings import Settings
+async_engine = create_app_engine(
+    settings.DATABASE_ASYNC_URL or get_async_url(settings.DATABASE_URL)
+)
+replica_router = ReplicaRouter(
+    async_engine,
+    [
+        create_app_engine(get_async_url(url))
+        for url in settings.DATABASE_REPLICA_URLS
+    ],
+    balancing=settings.DB_REPLICA_BALANCING,
+    window=settings.DB_READ_YOUR_WRITES_SECONDS,
+)
 
-engine = create_engine(Settings().DATABASE_URL)
 
+async def get_session(request: Request):
+    """Session on a replica for safe requests, on the primary otherwise.
 
-def get_session():  # pragma: no cover
-    with Session(engine) as session:
-        yield session
+    Requests that may have written make their client read from the
+    primary for a while, see app/db/routing.py.
+    """
+    engine = replica_router.engine_for(request)
+    replica_router.in_flight[engine] += 1
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+    finally:
+        replica_router.in_flight[engine] -= 1
+        if request.method not in SAFE_METHODS:
+            replica_router.record_write(request)
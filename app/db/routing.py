@@ -0,0 +1,64 @@
+"""Read replica routing.
+
+Safe requests (GET, HEAD) are served from a replica, picked round robin
+or by fewest sessions in flight, everything else from the primary.
+
+Replicas lag behind, so once a client has written it reads from the
+primary for `window` seconds and sees its own writes. Clients are told
+apart by their Authorization header, or their address when there is
+none. The window is kept per process: with several workers behind a
+load balancer that isn't sticky, keep it longer than the replication
+lag anyway.
+"""
+
+from collections import Counter
+from hashlib import blake2b
+from itertools import cycle
+
+from app.cache import TTLCache
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def client_key(request) -> str:
+    authorization = request.headers.get('authorization')
+    if authorization:
+        return blake2b(authorization.encode(), digest_size=16).hexdigest()
+    return request.client.host if request.client else ''
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary,
+        replicas=(),
+        balancing: str = 'round_robin',
+        window: float = 5,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.balancing = balancing
+        self.in_flight = Counter()
+        self._next_replica = cycle(self.replicas)
+        self._writers = TTLCache(ttl=window)
+
+    def pick_replica(self):
+        if self.balancing == 'least_connections':
+            return min(
+                self.replicas, key=lambda engine: self.in_flight[engine]
+            )
+        return next(self._next_replica)
+
+    def engine_for(self, request):
+        """The engine to serve `request` from."""
+        if (
+            not self.replicas
+            or request.method not in SAFE_METHODS
+            or self._writers.get(client_key(request))
+        ):
+            return self.primary
+        return self.pick_replica()
+
+    def record_write(self, request):
+        """Sends the client's reads to the primary for the window."""
+        self._writers.set(client_key(request), True)
@@ -3,29 +3,35 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_session
+from app.hashing import check_password, hashing_capacity
 from app.models.users import User
 from app.schemas.auth import Token
 from app.security import (
+    Principal,
     create_access_token,
     get_current_user,
-    verify_password,
+    get_user_by_email,
+    token_claims,
 )
 
 router = APIRouter(prefix='/auth', tags=['auth'])
-T_Session = Annotated[Session, Depends(get_session)]
+T_Session = Annotated[AsyncSession, Depends(get_session)]
 T_OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
 
 
-@router.post('/token', response_model=Token)
-def login_for_access_token(
+@router.post(
+    '/token',
+    response_model=Token,
+    dependencies=[Depends(hashing_capacity)],
+)
+async def login_for_access_token(
     session: T_Session,
     form_data: T_OAuth2Form,
 ):
-    user = session.scalar(select(User).where(User.email == form_data.username))
+    user = await get_user_by_email(session, form_data.username)
 
     if not user:
         raise HTTPException(
@@ -33,20 +39,29 @@ def login_for_access_token(
             detail='Incorrect email or password',
         )
 
-    if not verify_password(form_data.password, user.password):
+    valid, updated_hash = await check_password(
+        form_data.password, user.password
+    )
+
+    if not valid:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
             detail='Incorrect email or password',
         )
 
-    access_token = create_access_token(data={'sub': user.email})
+    # The Argon2 parameters changed since the hash was made.
+    if updated_hash:
+        user.password = updated_hash
+        await session.commit()
+
+    access_token = create_access_token(data=token_claims(user))
     return {'access_token': access_token, 'token_type': 'Bearer'}
 
 
 @router.post('/refresh_token', response_model=Token)
-def refresh_access_token(
-    user: User = Depends(get_current_user),
+async def refresh_access_token(
+    user: User | Principal = Depends(get_current_user),
 ):
-    new_access_token = create_access_token(data={'sub': user.email})
+    new_access_token = create_access_token(data=token_claims(user))
 
     return {'access_token': new_access_token, 'token_type': 'bearer'}
@@ -0,0 +1,24 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, HTTPException, Request
+
+router = APIRouter(prefix='/health', tags=['health'])
+
+
+@router.get('/live')
+def read_liveness():
+    """The process is up and its event loop answers."""
+    return {'status': 'alive'}
+
+
+@router.get('/ready')
+def read_readiness(request: Request):
+    """Whether warmup is done and the instance may take traffic, see
+    app/warmup.py."""
+    warmup = getattr(request.app.state, 'warmup', None)
+    if warmup is None or not warmup.done() or warmup.cancelled():
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail='Warming up',
+        )
+    return {'status': 'ready'}
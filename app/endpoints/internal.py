@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from app.db import database
+
+router = APIRouter(prefix='/internal', tags=['internal'])
+
+
+@router.get('/pool')
+def read_pool_stats():
+    """Connections checked out, idle and in overflow, and how long
+    checkouts have waited, for the primary and each replica."""
+    return {
+        **database.pool_stats(database.async_engine.pool),
+        'replicas': [
+            database.pool_stats(engine.pool)
+            for engine in database.replica_router.replicas
+        ],
+    }
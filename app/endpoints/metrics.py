@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from app.metrics import render_metrics
+
+router = APIRouter(tags=['metrics'])
+
+
+@router.get('/metrics')
+def read_metrics():
+    """Prometheus exposition of the app's metrics."""
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
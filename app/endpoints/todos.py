@@ -1,24 +1,125 @@
+import csv
+import io
+import logging
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Select, and_, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_session
-from app.models.todos import ToDo, ToDoStatus
+from app.cache import create_backend
+from app.counters import add_counts, count_deltas, read_counts
+from app.db.database import get_session, replica_router
+from app.etag import digest, etag_matches, make_etag
+from app.importer import iter_records, load_todos
+from app.metrics import CACHE_REQUESTS
+from app.models.todos import ToDo
 from app.models.users import User
+from app.pagination import decode_cursor, encode_cursor
 from app.schemas.message import Message
-from app.schemas.todos import ToDoList, ToDoPublic, ToDoSchema, ToDoUpdate
-from app.security import get_current_user
+from app.schemas.todos import (
+    ToDoBatchResult,
+    ToDoBulkResult,
+    ToDoBulkSelection,
+    ToDoBulkUpdate,
+    ToDoFilter,
+    ToDoImportResult,
+    ToDoList,
+    ToDoPublic,
+    ToDoSchema,
+    ToDoStats,
+    ToDoUpdate,
+)
+from app.search import search
+from app.security import Principal, get_current_user
+from app.serialization import dumps, json_response, todo_dict
+from app.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+# Pages of list_todos, see there.
+result_cache = create_backend(settings)
 
 router = APIRouter(prefix='/todos', tags=['todos'])
-T_Session = Annotated[Session, Depends(get_session)]
-T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_Session = Annotated[AsyncSession, Depends(get_session)]
+T_CurrentUser = Annotated[User | Principal, Depends(get_current_user)]
+
+
+async def touch_todos(session: AsyncSession, user_id: int):
+    """Bumps the user's todos version, call it with every todo write."""
+    await session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(todos_version=User.todos_version + 1)
+    )
+
+
+async def get_todos_version(session: AsyncSession, user: User | Principal):
+    if isinstance(user, User):
+        return user.todos_version
+
+    return await session.scalar(
+        select(User.todos_version).where(User.id == user.id)
+    )
+
+
+async def update_todos(session: AsyncSession, where, changes: dict, *columns):
+    """UPDATE of the todos matching `where`, returning `columns` and the
+    status each todo had before, for the counters.
+
+    Postgres gets the old status from a self-join on the rows locked
+    first, so a concurrent change to them is waited for. SQLite can't
+    return joined columns, its writes are serialized anyway so the old
+    statuses are selected beforehand.
+    """
+    if session.bind.dialect.name == 'postgresql':
+        old = (
+            select(ToDo.id, ToDo.status)
+            .where(*where)
+            .with_for_update()
+            .subquery('old')
+        )
+        return (
+            await session.execute(
+                update(ToDo)
+                .where(ToDo.id == old.c.id)
+                .values(**changes)
+                .returning(*columns, old.c.status)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+
+    old_statuses = dict(
+        (await session.execute(select(ToDo.id, ToDo.status).where(*where)))
+        .tuples()
+        .all()
+    )
+    rows = await session.execute(
+        update(ToDo)
+        .where(*where)
+        .values(**changes)
+        .returning(*columns, ToDo.id)
+        .execution_options(synchronize_session=False)
+    )
+    return [(*row[:-1], old_statuses[row[-1]]) for row in rows]
 
 
 @router.post('/', response_model=ToDoPublic)
-def create_todo(todo: ToDoSchema, session: T_Session, user: T_CurrentUser):
+async def create_todo(
+    todo: ToDoSchema, session: T_Session, user: T_CurrentUser
+):
     db_todo = ToDo(
         title=todo.title,
         description=todo.description,
@@ -26,74 +127,546 @@ def create_todo(todo: ToDoSchema, session: T_Session, user: T_CurrentUser):
         user_id=user.id,
     )
     session.add(db_todo)
-    session.commit()
-    session.refresh(db_todo)
+    await touch_todos(session, user.id)
+    await add_counts(session, user.id, {todo.status: 1})
+    await session.commit()
+    await session.refresh(db_todo)
 
     return db_todo
 
 
-# TODO: refactor to a class ToDoListFilters
+@router.post('/batch', response_model=ToDoBatchResult)
+async def create_todos_batch(
+    todos: Annotated[
+        list[dict[str, Any]],
+        Body(max_length=settings.TODOS_BATCH_SIZE_MAX),
+    ],
+    session: T_Session,
+    user: T_CurrentUser,
+    atomic: bool = True,
+):
+    """Creates many todos with a single multi-row INSERT ... RETURNING.
+
+    Every item is validated as a `ToDoSchema` first. If any is invalid,
+    an atomic batch (the default) is rejected as a whole, while with
+    `atomic=false` the valid items are created and the others reported
+    in `errors` by their position in the request.
+    """
+    rows = []
+    errors = []
+
+    for index, item in enumerate(todos):
+        try:
+            todo = ToDoSchema.model_validate(item)
+        except ValidationError as exc:
+            errors.append({
+                'index': index,
+                'detail': exc.errors(include_url=False, include_context=False),
+            })
+        else:
+            rows.append({**todo.model_dump(), 'user_id': user.id})
+
+    if errors and atomic:
+        raise RequestValidationError([
+            {**error, 'loc': ('body', item['index'], *error['loc'])}
+            for item in errors
+            for error in item['detail']
+        ])
+
+    created = []
+    if rows:
+        created = (
+            await session.scalars(
+                insert(ToDo).returning(ToDo, sort_by_parameter_order=True),
+                rows,
+            )
+        ).all()
+        await touch_todos(session, user.id)
+        await add_counts(
+            session, user.id, count_deltas(row['status'] for row in rows)
+        )
+        await session.commit()
+
+    return {'todos': created, 'errors': errors}
+
+
+def filter_todos(query: Select, filters: ToDoFilter, dialect: str):
+    """Applies `filters` to a query over todos.
+
+    Returns the query and, when searching with `q`, the relevance score
+    expression, otherwise None.
+    """
+    score = None
+
+    if filters.title:
+        query = query.filter(ToDo.title.contains(filters.title))
+
+    if filters.description:
+        query = query.filter(ToDo.description.contains(filters.description))
+
+    if filters.status:
+        query = query.filter(ToDo.status == filters.status)
+
+    if filters.q:
+        query, score = search(query, filters.q, dialect)
+
+    return query, score
+
+
+def select_todo_ids(user_id: int, selection: ToDoBulkSelection, dialect):
+    """Ids of the user's todos picked by a bulk request."""
+    query = select(ToDo.id).where(ToDo.user_id == user_id)
+
+    if selection.ids is not None:
+        if len(selection.ids) > settings.TODOS_BATCH_SIZE_MAX:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail='Too many ids.',
+            )
+        return query.where(ToDo.id.in_(selection.ids))
+
+    query, _ = filter_todos(query, selection.filter, dialect)
+    return query
+
+
+TODO_FIELDS = tuple(ToDoPublic.model_fields)
+
+
+def todo_fields(fields: str | None = None) -> tuple[str, ...]:
+    """The `ToDoPublic` fields asked for in `fields`, comma separated, in
+    their declaration order. `id` is always returned."""
+    if not fields:
+        return TODO_FIELDS
+
+    requested = {field.strip() for field in fields.split(',')} - {''}
+    unknown = requested.difference(TODO_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f'Unknown fields: {", ".join(sorted(unknown))}.',
+        )
+
+    requested.add('id')
+    return tuple(field for field in TODO_FIELDS if field in requested)
+
+
+T_Fields = Annotated[tuple[str, ...], Depends(todo_fields)]
+
+
 @router.get('/', response_model=ToDoList)
-def list_todos(  # noqa
+async def list_todos(  # noqa
+    request: Request,
     session: T_Session,
     user: T_CurrentUser,
-    title: str | None = None,
-    description: str | None = None,
-    status: ToDoStatus | None = None,
-    limit: int | None = None,
-    offset: int | None = None,
+    filters: Annotated[ToDoFilter, Depends()],
+    fields: T_Fields,
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    offset: Annotated[int | None, Query(ge=0)] = None,
+    cursor: str | None = None,
 ):
-    query = select(ToDo).where(ToDo.user_id == user.id)
+    """Lists the user's todos ordered by id, or by relevance when `q`
+    is given.
 
-    if title:
-        query = query.filter(ToDo.title.contains(title))
+    Pages are fetched by keyset: pass the `next_cursor` of a response as
+    `cursor` to get the following page. `offset` is kept for legacy
+    clients and is ignored when a cursor is given.
 
-    if description:
-        query = query.filter(ToDo.description.contains(description))
+    Responses carry an ETag that changes with any write to the user's
+    todos, a matching If-None-Match is answered with 304 before querying
+    them.
 
-    if status:
-        query = query.filter(ToDo.status == status)
+    `fields` picks the todo fields to return, e.g. `fields=title,status`,
+    and only those columns are read. Rows are selected as plain columns
+    and encoded directly, the `response_model` only documents the shape.
 
-    todos = session.scalars(query.offset(offset).limit(limit)).all()
+    Encoded pages are kept in `result_cache` under the user's todos
+    version and the normalized parameters. Every write bumps the version,
+    so it starts a new generation of keys and older pages age out.
+    """
+    version = await get_todos_version(session, user)
+    etag = make_etag(user.id, version, request.url.query)
+    if etag_matches(request, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+        )
+
+    limit = min(
+        limit or settings.TODOS_PAGE_SIZE_MAX, settings.TODOS_PAGE_SIZE_MAX
+    )
+
+    cache_key = None
+    if result_cache is not None:
+        cache_key = f'todos:{user.id}:{version}:' + digest(
+            sorted(filters.model_dump(mode='json', exclude_none=True).items()),
+            fields,
+            limit,
+            cursor,
+            None if cursor else offset,
+        )
+        body = await result_cache.get(cache_key)
+        CACHE_REQUESTS.labels('todos', 'miss' if body is None else 'hit').inc()
+        if body is not None:
+            return json_response(body, headers={'ETag': etag})
+
+    q = filters.q
+    query, score = filter_todos(
+        select(*(getattr(ToDo, field) for field in fields)).where(
+            ToDo.user_id == user.id
+        ),
+        filters,
+        session.bind.dialect.name,
+    )
+
+    if q:
+        query = query.add_columns(score).order_by(score.desc(), ToDo.id)
+    else:
+        query = query.order_by(ToDo.id)
 
-    return {'todos': todos}
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            last_id = int(position['id'])
+            last_score = float(position['score']) if q else None
+        except (ValueError, KeyError, TypeError) as exc:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor.'
+            ) from exc
+
+        if q:
+            query = query.filter(
+                or_(
+                    score < last_score,
+                    and_(score == last_score, ToDo.id > last_id),
+                )
+            )
+        else:
+            query = query.filter(ToDo.id > last_id)
+    elif offset:
+        query = query.offset(offset)
+
+    # One extra row tells whether there is a next page.
+    rows = (await session.execute(query.limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if q:
+            next_cursor = encode_cursor(score=last[len(fields)], id=last.id)
+        else:
+            next_cursor = encode_cursor(id=last.id)
+
+    body = dumps({
+        'todos': [todo_dict(fields, row) for row in rows],
+        'next_cursor': next_cursor,
+    })
+    if cache_key is not None:
+        await result_cache.set(cache_key, body)
+
+    return json_response(body, headers={'ETag': etag})
+
+
+@router.get('/stats', response_model=ToDoStats)
+async def read_todo_stats(
+    request: Request,
+    response: Response,
+    session: T_Session,
+    user: T_CurrentUser,
+):
+    """Counts the user's todos by status from their counters, with the
+    same ETag revalidation as the list."""
+    etag = make_etag('stats', user.id, await get_todos_version(session, user))
+    if etag_matches(request, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+        )
+
+    response.headers['ETag'] = etag
+    counts = await read_counts(session, user.id)
+
+    return {'counts': counts, 'total': sum(counts.values())}
+
+
+EXPORT_FIELDS = ('id', 'title', 'description', 'status')
+
+
+def export_rows_ndjson(fields, partition):
+    return b''.join(dumps(todo_dict(fields, row)) + b'\n' for row in partition)
+
+
+def export_rows_csv(fields, partition):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        todo_dict(fields, row).values() for row in partition
+    )
+    return buffer.getvalue()
+
+
+@router.get('/export')
+async def export_todos(
+    session: T_Session,
+    user: T_CurrentUser,
+    filters: Annotated[ToDoFilter, Depends()],
+    fields: T_Fields,
+    format: Literal['ndjson', 'csv'] = 'ndjson',
+):
+    """Streams every todo matching `filters` as NDJSON or CSV, with the
+    `fields` picked as in the list.
+
+    Rows are read through a server-side cursor and written out a chunk at
+    a time, so memory use doesn't depend on how many todos there are.
+    """
+    fields = tuple(field for field in EXPORT_FIELDS if field in fields)
+    # The session is closed before the body is sent, so the stream runs
+    # on its own connection from the same engine.
+    engine = session.bind
+    query, score = filter_todos(
+        select(*(getattr(ToDo, field) for field in fields)).where(
+            ToDo.user_id == user.id
+        ),
+        filters,
+        engine.dialect.name,
+    )
+    query = query.order_by(
+        *((score.desc(),) if score is not None else ()), ToDo.id
+    ).execution_options(yield_per=settings.TODOS_EXPORT_CHUNK_SIZE)
+
+    encode = export_rows_csv if format == 'csv' else export_rows_ndjson
+
+    async def stream():
+        if format == 'csv':
+            yield ','.join(fields) + '\r\n'
+
+        async with engine.connect() as connection:
+            result = await connection.stream(query)
+            async for partition in result.partitions():
+                yield encode(fields, partition)
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/csv' if format == 'csv' else 'application/x-ndjson',
+        headers={
+            'Content-Disposition': f'attachment; filename="todos.{format}"'
+        },
+    )
+
+
+async def run_import(session: AsyncSession, user_id: int, chunks, format: str):
+    """Imports the todos of `chunks` for `import_todos`. Yields the
+    counts so far after each loaded chunk, then the result."""
+    rows = []
+    errors = []
+    imported = failed = 0
+    deltas = count_deltas()
+
+    async def flush():
+        nonlocal imported, rows
+        await load_todos(session, rows)
+        imported += len(rows)
+        deltas.update(row['status'] for row in rows)
+        rows = []
+        logger.info(
+            'Import for user %s: %s rows loaded, %s rejected',
+            user_id,
+            imported,
+            failed,
+        )
+
+    async for line, record in iter_records(
+        chunks, format, settings.TODOS_IMPORT_MAX_RECORD_LENGTH
+    ):
+        if isinstance(record, ValueError):
+            detail = [{'type': 'value_error', 'loc': [], 'msg': str(record)}]
+        else:
+            try:
+                todo = ToDoSchema.model_validate(record)
+            except ValidationError as exc:
+                detail = exc.errors(include_url=False, include_context=False)
+            else:
+                rows.append({**todo.model_dump(), 'user_id': user_id})
+                if len(rows) >= settings.TODOS_IMPORT_CHUNK_SIZE:
+                    await flush()
+                    yield {'imported': imported, 'failed': failed}
+                continue
+
+        failed += 1
+        if len(errors) < settings.TODOS_IMPORT_MAX_ERRORS:
+            errors.append({'line': line, 'detail': detail})
+
+    if rows:
+        await flush()
+    if imported:
+        await touch_todos(session, user_id)
+        await add_counts(session, user_id, deltas)
+    await session.commit()
+
+    yield {'imported': imported, 'failed': failed, 'errors': errors}
+
+
+@router.post('/import', response_model=ToDoImportResult)
+async def import_todos(
+    request: Request,
+    session: T_Session,
+    user: T_CurrentUser,
+    format: Literal['ndjson', 'csv'] = 'ndjson',
+    progress: bool = False,
+):
+    """Imports todos from an NDJSON or CSV request body.
+
+    The body is parsed while it streams in and each record validated as a
+    `ToDoSchema`. Valid rows are loaded in chunks (COPY on Postgres) within
+    one transaction; invalid ones, and records longer than
+    `TODOS_IMPORT_MAX_RECORD_LENGTH`, are counted and the first
+    `TODOS_IMPORT_MAX_ERRORS` reported by line number.
+
+    With `progress`, the response is NDJSON instead: the counts so far
+    after each loaded chunk, then the result as the last line.
+    """
+    if not progress:
+        async for result in run_import(
+            session, user.id, request.stream(), format
+        ):
+            pass
+        return result
+
+    # The session is closed before the body is sent, so the import runs
+    # in its own session on the same engine.
+    engine = session.bind
+    user_id = user.id
+
+    async def stream():
+        async with AsyncSession(engine, expire_on_commit=False) as own:
+            async for counts in run_import(
+                own, user_id, request.stream(), format
+            ):
+                yield dumps(counts) + b'\n'
+        # The window get_session opened may have ended while importing.
+        replica_router.record_write(request)
+
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+
+@router.patch('/bulk', response_model=ToDoBulkResult)
+async def patch_todos_bulk(
+    bulk: ToDoBulkUpdate, session: T_Session, user: T_CurrentUser
+):
+    """Applies the same changes to many todos with one UPDATE."""
+    where = (
+        ToDo.user_id == user.id,
+        ToDo.id.in_(select_todo_ids(user.id, bulk, session.bind.dialect.name)),
+    )
+    changes = bulk.changes.model_dump(exclude_unset=True)
+
+    if 'status' in changes:
+        rows = await update_todos(session, where, changes, ToDo.id)
+        ids = [id for id, _ in rows]
+        await add_counts(
+            session,
+            user.id,
+            count_deltas(
+                [changes['status']] * len(rows), (old for _, old in rows)
+            ),
+        )
+    else:
+        ids = await session.scalars(
+            update(ToDo)
+            .where(*where)
+            .values(**changes)
+            .returning(ToDo.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids = ids.all()
+
+    if ids:
+        await touch_todos(session, user.id)
+    await session.commit()
+
+    return {'count': len(ids), 'ids': ids}
+
+
+@router.delete('/bulk', response_model=ToDoBulkResult)
+async def delete_todos_bulk(
+    selection: ToDoBulkSelection, session: T_Session, user: T_CurrentUser
+):
+    """Deletes many todos with one DELETE."""
+    rows = await session.execute(
+        delete(ToDo)
+        .where(
+            ToDo.user_id == user.id,
+            ToDo.id.in_(
+                select_todo_ids(user.id, selection, session.bind.dialect.name)
+            ),
+        )
+        .returning(ToDo.id, ToDo.status)
+        .execution_options(synchronize_session=False)
+    )
+    rows = rows.all()
+    ids = [id for id, _ in rows]
+    if ids:
+        await touch_todos(session, user.id)
+        await add_counts(
+            session,
+            user.id,
+            count_deltas(removed=(status for _, status in rows)),
+        )
+    await session.commit()
+
+    return {'count': len(ids), 'ids': ids}
 
 
 @router.delete('/{todo_id}', response_model=Message)
-def delete_todo(todo_id: int, session: T_Session, user: T_CurrentUser):
-    todo = session.scalar(
-        select(ToDo).where(ToDo.user_id == user.id, ToDo.id == todo_id)
+async def delete_todo(todo_id: int, session: T_Session, user: T_CurrentUser):
+    status = await session.scalar(
+        delete(ToDo)
+        .where(ToDo.user_id == user.id, ToDo.id == todo_id)
+        .returning(ToDo.status)
     )
 
-    if not todo:
+    if status is None:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Task not found.'
         )
 
-    session.delete(todo)
-    session.commit()
+    await touch_todos(session, user.id)
+    await add_counts(session, user.id, {status: -1})
+    await session.commit()
 
     return {'message': 'Task has been deleted successfully.'}
 
 
 @router.patch('/{todo_id}', response_model=ToDoUpdate)
-def patch_todo(
+async def patch_todo(
     todo_id: int, session: T_Session, user: T_CurrentUser, todo: ToDoUpdate
 ):
-    db_todo = session.scalar(
-        select(ToDo).where(ToDo.user_id == user.id, ToDo.id == todo_id)
-    )
+    changes = todo.model_dump(exclude_unset=True)
+    where = (ToDo.user_id == user.id, ToDo.id == todo_id)
+    old_status = None
+
+    if 'status' in changes:
+        rows = await update_todos(session, where, changes, ToDo)
+        db_todo, old_status = rows[0] if rows else (None, None)
+    elif changes:
+        db_todo = await session.scalar(
+            update(ToDo)
+            .where(*where)
+            .values(**changes)
+            .returning(ToDo)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db_todo = await session.scalar(select(ToDo).where(*where))
 
     if not db_todo:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Task not found.'
         )
 
-    for key, value in todo.model_dump(exclude_unset=True).items():
-        setattr(db_todo, key, value)
-
-    session.add(db_todo)
-    session.commit()
-    session.refresh(db_todo)
+    if old_status is not None:
+        await add_counts(
+            session, user.id, count_deltas([db_todo.status], [old_status])
+        )
+    if changes:
+        await touch_todos(session, user.id)
+        await session.commit()
 
     return db_todo
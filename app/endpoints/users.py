@@ -1,81 +1,113 @@
+import asyncio
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.database import get_session
+from app.etag import etag_matches, make_etag
+from app.hashing import hash_password, hashing_capacity
 from app.models.users import User
 from app.schemas.message import Message
 from app.schemas.users import UserList, UserPublic, UserSchema
-from app.security import get_current_user, get_password_hash
+from app.security import (
+    Principal,
+    get_current_user,
+    invalidate_token_version,
+)
+from app.serialization import json_response, user_dict
 
 router = APIRouter(prefix='/users', tags=['users'])
-T_Session = Annotated[Session, Depends(get_session)]
-T_CurrentUser = Annotated[User, Depends(get_current_user)]
+T_Session = Annotated[AsyncSession, Depends(get_session)]
+T_CurrentUser = Annotated[User | Principal, Depends(get_current_user)]
 
 
 @router.get('/', response_model=UserList)
-def read_users(session: T_Session, limit: int = 10, offset: int = 0):
-    users = session.scalars(select(User).limit(limit).offset(offset))
-    return {'users': users}
+async def read_users(session: T_Session, limit: int = 10, offset: int = 0):
+    users = await session.execute(
+        select(User.id, User.username, User.email).limit(limit).offset(offset)
+    )
+    return json_response({'users': [user_dict(*row) for row in users]})
 
 
-@router.post('/', status_code=HTTPStatus.CREATED, response_model=UserPublic)
-def create_user(user: UserSchema, session: T_Session):
-    """Creates User"""
-    db_user = session.scalar(
-        select(User).where(
-            (User.username == user.username) | (User.email == user.email)
-        )
-    )
+def duplicated_field(exc: IntegrityError):
+    """Tells which unique column an INSERT on users collided on."""
+    diag = getattr(exc.orig, 'diag', None)
+    # Postgres names the constraint, SQLite only has the message.
+    where = getattr(diag, 'constraint_name', None) or str(exc.orig)
 
-    existing_username = session.scalar(
-        select(User).where(User.username == user.username)
-    )
-    if existing_username:
-        raise HTTPException(
-            status_code=HTTPStatus.BAD_REQUEST,
-            detail='Username already exists',
-        )
+    for field in ('username', 'email'):
+        if field in where:
+            return field
+
+    raise exc
 
-    existing_email = session.scalar(
-        select(User).where(User.email == user.email)
-    )
-    if existing_email:
-        raise HTTPException(
-            status_code=HTTPStatus.BAD_REQUEST,
-            detail='Email already exists',
-        )
 
-    db_user = User(
-        username=user.username,
-        email=user.email,
-        password=get_password_hash(user.password),
+@router.post(
+    '/',
+    status_code=HTTPStatus.CREATED,
+    response_model=UserPublic,
+    dependencies=[Depends(hashing_capacity)],
+)
+async def create_user(user: UserSchema, session: T_Session):
+    """Creates User
+
+    Uniqueness is left to the users constraints, so signup is a single
+    INSERT ... RETURNING. The password is hashed while the connection is
+    being checked out.
+    """
+    password, _ = await asyncio.gather(
+        hash_password(user.password), session.connection()
     )
 
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    try:
+        db_user = await session.scalar(
+            insert(User)
+            .values(
+                username=user.username, email=user.email, password=password
+            )
+            .returning(User)
+        )
+        await session.commit()
+    except IntegrityError as exc:
+        await session.rollback()
+        field = duplicated_field(exc)
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f'{field.capitalize()} already exists',
+        ) from exc
 
     return db_user
 
 
 @router.get('/{user_id}', response_model=UserPublic)
-def read_user(user_id: int, session: T_Session):
-    db_user = session.scalar(select(User).where(User.id == user_id))
+async def read_user(
+    user_id: int, request: Request, response: Response, session: T_Session
+):
+    db_user = await session.scalar(select(User).where(User.id == user_id))
 
     if not db_user:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='User not found'
         )
 
+    # Every change to a user goes through update_user, which bumps it.
+    etag = make_etag('user', db_user.id, db_user.token_version)
+    if etag_matches(request, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+        )
+
+    response.headers['ETag'] = etag
+
     return db_user
 
 
 @router.put('/{user_id}', response_model=UserPublic)
-def update_user(
+async def update_user(
     user_id: int,
     user: UserSchema,
     session: T_Session,
@@ -86,18 +118,23 @@ def update_user(
             status_code=HTTPStatus.FORBIDDEN, detail='Not enough permission'
         )
 
-    current_user.email = user.email
-    current_user.username = user.username
-    current_user.password = get_password_hash(user.password)
+    # Already in the identity map unless authenticated statelessly.
+    db_user = await session.get(User, user_id)
 
-    session.commit()
-    session.refresh(current_user)
+    db_user.email = user.email
+    db_user.username = user.username
+    db_user.password = await hash_password(user.password)
+    db_user.token_version += 1
 
-    return current_user
+    await session.commit()
+    await session.refresh(db_user)
+    invalidate_token_version(user_id)
+
+    return db_user
 
 
 @router.delete('/{user_id}', response_model=Message)
-def delete_user(
+async def delete_user(
     user_id: int,
     session: T_Session,
     current_user: T_CurrentUser,
@@ -106,7 +143,9 @@ def delete_user(
         raise HTTPException(
             status_code=HTTPStatus.FORBIDDEN, detail='Not enough permission'
         )
-    session.delete(current_user)
-    session.commit()
+
+    await session.delete(await session.get(User, user_id))
+    await session.commit()
+    invalidate_token_version(user_id)
 
     return {'message': 'User deleted'}
@@ -0,0 +1,29 @@
+from hashlib import blake2b
+
+from fastapi import Request
+
+
+def digest(*parts) -> str:
+    """Short hex digest of `parts`, told apart by their str()."""
+    return blake2b(
+        '\x1f'.join(str(part) for part in parts).encode(), digest_size=8
+    ).hexdigest()
+
+
+def make_etag(*parts) -> str:
+    """Builds a weak ETag out of whatever identifies a representation."""
+    return f'W/"{digest(*parts)}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of `etag` against the If-None-Match header."""
+    header = request.headers.get('if-none-match')
+
+    if not header:
+        return False
+
+    if header.strip() == '*':
+        return True
+
+    candidates = (tag.strip().removeprefix('W/') for tag in header.split(','))
+    return etag.removeprefix('W/') in candidates
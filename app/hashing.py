@@ -0,0 +1,130 @@
+"""Argon2 password hashing.
+
+Hashing is deliberately slow and memory hungry, so request handlers go
+through `HashingPool`, which runs the work in a small process pool kept
+apart from the threadpool serving everything else. The pool is bounded:
+once every worker is busy and `HASH_QUEUE_LIMIT` calls are waiting,
+further calls fail fast with 503 instead of piling up. Endpoints that
+hash take the `hashing_capacity` dependency to shed such requests
+before doing anything else for them.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from app.metrics import PASSWORD_HASH_DURATION
+from app.profiling import timed
+from app.settings import get_settings
+
+settings = get_settings()
+pwd_context = PasswordHash((
+    Argon2Hasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST,
+        parallelism=settings.ARGON2_PARALLELISM,
+    ),
+))
+
+
+def get_password_hash(password: str):
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hash_password: str):
+    return pwd_context.verify(plain_password, hash_password)
+
+
+def verify_and_update_password(plain_password: str, hash_password: str):
+    """Returns whether the password matches and, if the hash was made with
+    other Argon2 parameters than the current ones, a fresh hash."""
+    return pwd_context.verify_and_update(plain_password, hash_password)
+
+
+class HashingPool:
+    """Bounded executor for the functions above.
+
+    With `workers=0` the work runs in the shared threadpool instead, which
+    is cheaper for tests and tiny deployments.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Forking a process that runs an event loop and threads isn't
+            # safe, start workers from scratch instead.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self._executor
+
+    def check_capacity(self):
+        """Raises 503 when the pool is full."""
+        if self.pending >= max(self.workers, 1) + self.queue_limit:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server busy, try again later.',
+                headers={'Retry-After': '1'},
+            )
+
+    async def run(self, func, *args):
+        self.check_capacity()
+        self.pending += 1
+        try:
+            if not self.workers:
+                return await run_in_threadpool(func, *args)
+
+            return await asyncio.wrap_future(
+                self._get_executor().submit(func, *args)
+            )
+        finally:
+            self.pending -= 1
+
+    async def warm_up(self):
+        """Starts the worker processes ahead of the first call, each has
+        to import the app before it can hash."""
+        if self.workers and self._executor is None:
+            await asyncio.gather(
+                *(
+                    self.run(get_password_hash, 'warm up')
+                    for _ in range(self.workers)
+                )
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(settings.HASH_WORKERS, settings.HASH_QUEUE_LIMIT)
+
+
+def hashing_capacity():
+    """Dependency shedding the request while the hashing pool is full."""
+    hashing_pool.check_capacity()
+
+
+async def hash_password(password: str):
+    with PASSWORD_HASH_DURATION.labels('hash').time(), timed('hash'):
+        return await hashing_pool.run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hash_password: str):
+    """Async `verify_and_update_password` running in the hashing pool."""
+    with PASSWORD_HASH_DURATION.labels('verify').time(), timed('hash'):
+        return await hashing_pool.run(
+            verify_and_update_password, plain_password, hash_password
+        )
@@ -0,0 +1,127 @@
+"""Incremental parsing and loading for the todo import endpoint."""
+
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.todos import ToDo
+
+COPY_TODOS = 'COPY todos (title, description, status, user_id) FROM STDIN'
+MALFORMED = ValueError('Malformed record')
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int):
+    """Splits a byte stream into text lines without reading it whole.
+
+    A line longer than `max_length` characters is dropped as it streams
+    in and yielded as None.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    overlong = False
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield None if overlong or len(line) > max_length else line
+            overlong = False
+        if len(pending) > max_length:
+            pending, overlong = '', True
+
+    pending += decoder.decode(b'', final=True)
+    if overlong or len(pending) > max_length:
+        yield None
+    elif pending:
+        yield pending
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes], format: str, max_length: int
+):
+    """Yields `(line_number, record)` for each NDJSON or CSV record.
+
+    `record` is a dict, or a ValueError saying why the line can't be
+    parsed at all. CSV input needs a header row; quoted fields may span
+    lines. A record longer than `max_length` characters is reported and
+    skipped, parsing resumes on the next line.
+    """
+    too_long = ValueError(f'Record longer than {max_length} characters')
+    header = None
+    parts = []
+    size = quotes = start = 0
+
+    async for number, line in _enumerate(
+        iter_lines(chunks, max_length), start=1
+    ):
+        if format == 'ndjson':
+            if line is None:
+                yield number, too_long
+                continue
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                value = None
+            yield number, value if isinstance(value, dict) else MALFORMED
+            continue
+
+        start = start or number
+        if line is not None:
+            parts.append(line)
+            size += len(line) + 1
+            quotes += line.count('"')
+        if line is None or size > max_length:
+            yield start, too_long
+            parts, size, quotes, start = [], 0, 0, 0
+            continue
+        # Inside a quoted field until the quotes are balanced.
+        if quotes % 2:
+            continue
+
+        fields = next(csv.reader(['\n'.join(parts)]), [])
+        record_start = start
+        parts, size, quotes, start = [], 0, 0, 0
+
+        if not fields:
+            continue
+        if header is None:
+            header = [field.strip() for field in fields]
+            continue
+
+        yield record_start, dict(zip(header, fields))
+
+    # An unterminated quote swallowed the rest of the input.
+    if parts:
+        yield start, MALFORMED
+
+
+async def _enumerate(items, start=0):
+    async for item in items:
+        yield start, item
+        start += 1
+
+
+async def load_todos(session: AsyncSession, rows: list[dict]):
+    """Inserts `rows` with COPY on Postgres, executemany elsewhere."""
+    if session.bind.dialect.name != 'postgresql':
+        await session.execute(insert(ToDo), rows)
+        return
+
+    connection = await session.connection()
+    raw = await connection.get_raw_connection()
+
+    async with raw.driver_connection.cursor() as cursor:
+        async with cursor.copy(COPY_TODOS) as copy:
+            for row in rows:
+                await copy.write_row((
+                    row['title'],
+                    row['description'],
+                    row['status'].value,
+                    row['user_id'],
+                ))
@@ -0,0 +1,141 @@
+"""Prometheus metrics.
+
+Requests are timed by `MetricsMiddleware`, labelled with the route's
+path template rather than the raw path so ids don't blow up the series
+count. Query counts and time come from the request's profile, see
+app/profiling.py.
+
+With several worker processes set `PROMETHEUS_MULTIPROC_DIR` to an
+empty directory shared by the workers, the `/metrics` endpoint then
+aggregates the values of every process.
+"""
+
+import os
+from time import perf_counter
+from weakref import WeakSet
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+from app.profiling import current_profile
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time to serve a request, its _count is the request count.',
+    ['method', 'route', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries run to serve a request.',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database queries to serve a request.',
+    ['route'],
+)
+PASSWORD_HASH_DURATION = Histogram(
+    'password_hash_duration_seconds',
+    'Time to hash or verify a password, including the wait for a worker.',
+    ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Result cache lookups by cache and result, hit or miss.',
+    ['cache', 'result'],
+)
+POOL_CONNECTIONS = Gauge(
+    'db_pool_connections',
+    'Open database connections.',
+    multiprocess_mode='livesum',
+)
+POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out',
+    'Database connections in use.',
+    multiprocess_mode='livesum',
+)
+POOL_WAIT_DURATION = Histogram(
+    'db_pool_wait_duration_seconds',
+    'Time to check out a database connection.',
+    ['timed_out'],
+)
+
+
+_instrumented = WeakSet()
+
+
+def instrument_pool(engine):
+    """Keeps the pool gauges and wait histogram of `engine` current.
+    Engines already instrumented are left as they are."""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+    if sync_engine in _instrumented:
+        return
+    _instrumented.add(sync_engine)
+
+    event.listen(sync_engine, 'connect', lambda *_: POOL_CONNECTIONS.inc())
+    event.listen(sync_engine, 'close', lambda *_: POOL_CONNECTIONS.dec())
+    event.listen(sync_engine, 'checkout', lambda *_: POOL_CHECKED_OUT.inc())
+    event.listen(sync_engine, 'checkin', lambda *_: POOL_CHECKED_OUT.dec())
+
+    waits = getattr(sync_engine.pool, 'waits', None)
+    if waits is not None:
+        waits.listeners.append(
+            lambda seconds, timed_out: POOL_WAIT_DURATION.labels(
+                str(timed_out).lower()
+            ).observe(seconds)
+        )
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+
+            route = scope.get('route')
+            # Unmatched paths share one label, they are client input.
+            path = route.path if route is not None else '<unmatched>'
+            REQUEST_DURATION.labels(scope['method'], path, status).observe(
+                elapsed
+            )
+            profile = current_profile.get()
+            if profile is not None:
+                REQUEST_QUERIES.labels(path).observe(profile.count)
+                REQUEST_DB_DURATION.labels(path).observe(profile.seconds)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Returns the exposition text and its content type."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:  # pragma: no cover
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,6 +1,6 @@
 from enum import Enum
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, ForeignKey, Index, event
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import table_registry
@@ -17,9 +17,62 @@ class ToDoStatus(str, Enum):
 @table_registry.mapped_as_dataclass
 class ToDo:
     __tablename__ = 'todos'
+    __table_args__ = (Index('ix_todos_user_id_id', 'user_id', 'id'),)
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     title: Mapped[str]
     description: Mapped[str]
     status: Mapped[ToDoStatus]
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
+
+
+@table_registry.mapped_as_dataclass
+class ToDoCounter:
+    """How many todos a user has in a status, see app/counters.py."""
+
+    __tablename__ = 'todo_counters'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE'), primary_key=True
+    )
+    status: Mapped[ToDoStatus] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0, server_default='0')
+
+
+# Search indexes, see app/search.py. They are plain DDL because they only
+# exist on one dialect each.
+event.listen(
+    ToDo.__table__,
+    'after_create',
+    DDL(
+        'CREATE INDEX ix_todos_search ON todos '
+        "USING gin (to_tsvector('simple', title || ' ' || description))"
+    ).execute_if(dialect='postgresql'),
+)
+
+for statement in (
+    'CREATE VIRTUAL TABLE todos_fts USING fts5('
+    "title, description, content='todos', content_rowid='id')",
+    'CREATE TRIGGER todos_fts_ai AFTER INSERT ON todos BEGIN '
+    'INSERT INTO todos_fts(rowid, title, description) '
+    'VALUES (new.id, new.title, new.description); END',
+    'CREATE TRIGGER todos_fts_ad AFTER DELETE ON todos BEGIN '
+    'INSERT INTO todos_fts(todos_fts, rowid, title, description) '
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    'CREATE TRIGGER todos_fts_au AFTER UPDATE ON todos BEGIN '
+    'INSERT INTO todos_fts(todos_fts, rowid, title, description) '
+    "VALUES ('delete', old.id, old.title, old.description); "
+    'INSERT INTO todos_fts(rowid, title, description) '
+    'VALUES (new.id, new.title, new.description); END',
+):
+    event.listen(
+        ToDo.__table__,
+        'after_create',
+        DDL(statement).execute_if(dialect='sqlite'),
+    )
+
+event.listen(
+    ToDo.__table__,
+    'before_drop',
+    DDL('DROP TABLE IF EXISTS todos_fts').execute_if(dialect='sqlite'),
+)
@@ -17,3 +17,11 @@ class User:
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
     )
+    # Bumped to revoke every token issued to the user so far.
+    token_version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
+    # Bumped by every write to the user's todos, drives their ETags.
+    todos_version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
@@ -0,0 +1,24 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+
+def encode_cursor(**position) -> str:
+    """Packs the sort key of the last row of a page into an opaque token."""
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Reverses `encode_cursor`, raising `ValueError` on malformed input."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+
+    try:
+        position = json.loads(urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+    if not isinstance(position, dict):
+        raise ValueError('Invalid cursor')
+
+    return position
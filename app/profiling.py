@@ -0,0 +1,171 @@
+"""Per-request SQL profile, Server-Timing and query budgets.
+
+`ProfilerMiddleware` gives each request a `RequestProfile`, kept in a
+context variable. SQLAlchemy cursor events add every statement run
+while serving it, with its fingerprint, duration and row count, and
+`timed` adds named spans such as auth. The totals go out in a
+`Server-Timing` header, e.g. `db;dur=3.2, auth;dur=0.4`.
+
+Each route may run at most its budget of statements, see
+`QUERY_BUDGETS`. Going over is logged with the most repeated statement,
+which is what an N+1 looks like, or raises `QueryBudgetExceeded` when
+`QUERY_BUDGET_STRICT` is on, as in the tests.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Expanded IN lists and literals, so one query shape has one fingerprint
+# whatever its parameters.
+_PARAMETER = r'(?:%\(\w+\)s|\?|\$\d+|\d+)'
+_IN_LIST = re.compile(rf'\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    statement = _STRING.sub('?', statement)
+    statement = _IN_LIST.sub('(...)', statement)
+    statement = _NUMBER.sub('?', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+class RequestProfile:
+    __slots__ = ('count', 'seconds', 'statements', 'timings')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # (fingerprint, seconds, rows) per statement run
+        self.statements = []
+        self.timings = {}
+
+    def add_statement(self, statement: str, seconds: float, rows: int):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append((fingerprint(statement), seconds, rows))
+
+    def most_repeated(self) -> tuple[str, int]:
+        counts = Counter(statement for statement, _, _ in self.statements)
+        return counts.most_common(1)[0] if counts else ('', 0)
+
+    def server_timing(self) -> str:
+        timings = {'db': self.seconds, **self.timings}
+        return ', '.join(
+            f'{name};dur={seconds * 1000:.1f}'
+            for name, seconds in timings.items()
+        )
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar(
+    'current_profile', default=None
+)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _statement_started(conn, *_):
+    if current_profile.get() is not None:
+        conn.info.setdefault('statement_started', []).append(perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, *_):
+    profile = current_profile.get()
+    if profile is not None and conn.info.get('statement_started'):
+        profile.add_statement(
+            statement,
+            perf_counter() - conn.info['statement_started'].pop(),
+            cursor.rowcount,
+        )
+
+
+@contextmanager
+def timed(name: str):
+    """Adds the time spent in the block to the request's `name` span."""
+    profile = current_profile.get()
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.timings[name] = (
+                profile.timings.get(name, 0.0) + perf_counter() - start
+            )
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Called with the route key, e.g. 'GET /v1/todos/', and the profile of
+# every finished request.
+listeners = []
+
+
+class ProfilerMiddleware:
+    """Profiles each request, see the module docstring."""
+
+    def __init__(self, app, settings):
+        self.app = app
+        # Read on every request, so tests can switch strict mode on.
+        self.settings = settings
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if (
+                message['type'] == 'http.response.start'
+                and self.settings.SERVER_TIMING
+            ):
+                headers = MutableHeaders(raw=message['headers'])
+                headers.append('Server-Timing', profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+
+        route = scope.get('route')
+        if route is None:
+            return
+
+        key = f'{scope["method"]} {route.path}'
+        for listener in listeners:
+            listener(key, profile)
+        self.check_budget(key, profile)
+
+    def check_budget(self, key: str, profile: RequestProfile):
+        budget = self.settings.QUERY_BUDGETS.get(
+            key, self.settings.QUERY_BUDGET_DEFAULT
+        )
+        if not budget or profile.count <= budget:
+            return
+
+        statement, repeats = profile.most_repeated()
+        message = (
+            f'{key} ran {profile.count} statements, its budget is {budget}. '
+            f'Most repeated ({repeats}x): {statement}'
+        )
+        if self.settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
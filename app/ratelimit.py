@@ -0,0 +1,179 @@
+"""Token bucket rate limiting.
+
+Every route runs `rate_limit`, and those listed in `RATE_LIMITS` take a
+token from the bucket of the client address and, when configured, from
+the one of the username the request names. A limit of 'N/period' is a
+bucket holding up to N tokens and regaining N per period, so bursts of
+N go through and longer runs are held to the rate. A request finding a
+bucket empty is rejected with 429 and Retry-After before the endpoint
+runs, so before any password hashing or database work.
+
+Buckets live in the process (`MemoryLimiter`), or in Redis where every
+worker shares them (`RedisLimiter`). Behind a proxy, run uvicorn with
+--proxy-headers so the client address is the caller's.
+"""
+
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from http import HTTPStatus
+from math import ceil
+from time import monotonic
+
+from fastapi import HTTPException, Request
+
+from app.cache import Redis, RedisError
+from app.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+@lru_cache
+def parse_rate(rate: str) -> tuple[int, float]:
+    """'10/minute' as its bucket capacity, 10, and the tokens regained
+    per second."""
+    count, _, period = rate.partition('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period.strip()]
+
+
+class MemoryLimiter:
+    """Buckets of this process. Past `maxsize` the least recently used
+    bucket is dropped, which only forgives its client."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: int, refill: float) -> float:
+        """Takes a token from the bucket `key`. Returns 0 if there was
+        one, else the seconds until there is."""
+        now = monotonic()
+        tokens, updated = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Same as MemoryLimiter.take, atomic and on the server's clock. Lua
+# numbers come back as integers, hence the string.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1e6
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+return tostring(wait)
+"""
+
+
+class RedisLimiter:
+    """Buckets in Redis under `prefix`, expiring once they would be full
+    again.
+
+    When Redis fails the request is let through: the limiter protects
+    the API, it shouldn't take it down with it.
+    """
+
+    def __init__(self, client, prefix: str = 'ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str):
+        if Redis is None:  # pragma: no cover
+            raise RuntimeError(
+                'The redis package is needed for RATE_LIMIT_URL.'
+            )
+        return cls(Redis.from_url(url))
+
+    async def take(self, key: str, capacity: int, refill: float) -> float:
+        try:
+            wait = await self._take(
+                keys=[self.prefix + key], args=[capacity, refill]
+            )
+        except RedisError:
+            logger.warning('Rate limit check failed', exc_info=True)
+            return 0.0
+        return float(wait)
+
+
+def create_limiter(settings):
+    """The limiter picked by `RATE_LIMIT_BACKEND`, or None."""
+    if settings.RATE_LIMIT_BACKEND == 'redis':
+        return RedisLimiter.from_url(settings.RATE_LIMIT_URL)
+    if settings.RATE_LIMIT_BACKEND == 'memory':
+        return MemoryLimiter(settings.RATE_LIMIT_MAXSIZE)
+    return None
+
+
+limiter = create_limiter(settings)
+
+
+async def request_username(request: Request) -> str | None:
+    """The username field of the form or JSON body, if any. The body
+    was read already to validate it, so this is cheap."""
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        username = (await request.form()).get('username')
+    elif content_type.startswith('application/json'):
+        body = await request.json()
+        username = body.get('username') if isinstance(body, dict) else None
+    else:
+        return None
+    return username.casefold() if isinstance(username, str) else None
+
+
+async def rate_limit(request: Request):
+    """Dependency enforcing the route's `RATE_LIMITS`."""
+    route = request.scope.get('route')
+    if limiter is None or route is None:
+        return
+    route_key = f'{request.method} {route.path}'
+    limits = settings.RATE_LIMITS.get(route_key)
+    if not limits:
+        return
+
+    subjects = {}
+    if 'ip' in limits:
+        subjects['ip'] = request.client.host if request.client else ''
+    if 'username' in limits:
+        subjects['username'] = await request_username(request)
+
+    for kind, subject in subjects.items():
+        if subject is None:
+            continue
+        capacity, refill = parse_rate(limits[kind])
+        wait = await limiter.take(
+            f'{route_key}:{kind}:{subject}', capacity, refill
+        )
+        if wait:
+            raise HTTPException(
+                status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                detail='Too many requests, try again later.',
+                headers={'Retry-After': str(ceil(wait))},
+            )
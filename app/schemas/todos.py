@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Any
+
+from pydantic import BaseModel, model_validator
 
 from app.models.todos import ToDoStatus
 
@@ -15,9 +17,71 @@ class ToDoPublic(ToDoSchema):
 
 class ToDoList(BaseModel):
     todos: list[ToDoPublic]
+    next_cursor: str | None = None
 
 
 class ToDoUpdate(BaseModel):
     title: str | None = None
     description: str | None = None
     status: ToDoStatus | None = None
+
+
+class ToDoFilter(BaseModel):
+    title: str | None = None
+    description: str | None = None
+    status: ToDoStatus | None = None
+    q: str | None = None
+
+
+class ToDoBatchError(BaseModel):
+    index: int
+    detail: list[dict[str, Any]]
+
+
+class ToDoBatchResult(BaseModel):
+    todos: list[ToDoPublic]
+    errors: list[ToDoBatchError] = []
+
+
+class ToDoBulkSelection(BaseModel):
+    """Todos to act on, either by `ids` or by `filter`, never both."""
+
+    ids: list[int] | None = None
+    filter: ToDoFilter | None = None
+
+    @model_validator(mode='after')
+    def check_selection(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError('Give either ids or filter.')
+        return self
+
+
+class ToDoBulkUpdate(ToDoBulkSelection):
+    changes: ToDoUpdate
+
+    @model_validator(mode='after')
+    def check_changes(self):
+        if not self.changes.model_fields_set:
+            raise ValueError('No changes given.')
+        return self
+
+
+class ToDoBulkResult(BaseModel):
+    count: int
+    ids: list[int]
+
+
+class ToDoImportError(BaseModel):
+    line: int
+    detail: list[dict[str, Any]]
+
+
+class ToDoImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: list[ToDoImportError]
+
+
+class ToDoStats(BaseModel):
+    counts: dict[ToDoStatus, int]
+    total: int
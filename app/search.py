@@ -0,0 +1,67 @@
+"""Full-text search over todo titles and descriptions.
+
+On Postgres the text is matched against a GIN-indexed tsvector and
+ranked with `ts_rank`. SQLite, used for local runs, matches against an
+FTS5 table kept in sync by triggers and ranks with `bm25`. Either way
+the rank is exposed as a score where higher means more relevant.
+The schema objects are created in `app.models.todos`.
+"""
+
+import re
+
+from sqlalchemy import (
+    ColumnElement,
+    Double,
+    Select,
+    cast,
+    func,
+    literal,
+    literal_column,
+    or_,
+)
+from sqlalchemy.dialects.postgresql import to_tsvector, websearch_to_tsquery
+from sqlalchemy.sql import column, table
+
+from app.models.todos import ToDo
+
+# Must match the expression of the ix_todos_search index.
+TODO_TSVECTOR = to_tsvector(
+    literal_column("'simple'"),
+    ToDo.title.op('||')(literal_column("' '")).op('||')(ToDo.description),
+)
+
+todos_fts = table('todos_fts', column('rowid'))
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input can't use FTS5 query syntax.
+    return ' '.join(f'"{term}"' for term in re.findall(r'\w+', q))
+
+
+def search(
+    query: Select, q: str, dialect: str
+) -> tuple[Select, ColumnElement[float]]:
+    """Restricts `query` to todos matching `q`.
+
+    Returns the filtered query and the relevance score expression.
+    """
+    if dialect == 'postgresql':
+        tsquery = websearch_to_tsquery(literal_column("'simple'"), q)
+        # ts_rank is a real, whose text form doesn't round-trip through a
+        # Python float; scores are compared again when paging by cursor.
+        score = cast(func.ts_rank(TODO_TSVECTOR, tsquery), Double)
+        return query.where(TODO_TSVECTOR.op('@@')(tsquery)), score
+
+    if dialect == 'sqlite':
+        fts = literal_column('todos_fts')
+        score = -func.bm25(fts)
+        query = query.join(todos_fts, todos_fts.c.rowid == ToDo.id).where(
+            fts.op('MATCH')(_fts5_query(q) or '""')
+        )
+        return query, score
+
+    # No index support: fall back to an unranked substring match.
+    query = query.where(
+        or_(ToDo.title.contains(q), ToDo.description.contains(q))
+    )
+    return query, literal(0.0)
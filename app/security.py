@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from http import HTTPStatus
 from zoneinfo import ZoneInfo
@@ -6,25 +7,28 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jwt import decode, encode
 from jwt.exceptions import ExpiredSignatureError, PyJWTError
-from pwdlib import PasswordHash
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
 from app.db.database import get_session
 from app.models.users import User
-from app.settings import Settings
+from app.profiling import timed
+from app.settings import get_settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='v1/auth/token')
-pwd_context = PasswordHash.recommended()
-settings = Settings()
+settings = get_settings()
+token_versions = TTLCache(ttl=settings.TOKEN_VERSION_CACHE_TTL)
 
 
-def get_password_hash(password: str):
-    return pwd_context.hash(password)
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Authenticated user as described by its token, used in stateless
+    mode instead of a `User` loaded from the database."""
 
-
-def verify_password(plain_password: str, hash_password: str):
-    return pwd_context.verify(plain_password, hash_password)
+    id: int
+    email: str
+    token_version: int
 
 
 def create_access_token(data: dict):
@@ -43,33 +47,72 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def get_current_user(
-    session: Session = Depends(get_session),
+def token_claims(user: User | Principal):
+    return {'sub': user.email, 'uid': user.id, 'ver': user.token_version}
+
+
+async def get_token_version(session: AsyncSession, user_id: int):
+    version = token_versions.get(user_id)
+
+    if version is None:
+        version = await session.scalar(
+            select(User.token_version).where(User.id == user_id)
+        )
+        if version is not None:
+            token_versions.set(user_id, version)
+
+    return version
+
+
+async def get_user_by_email(session: AsyncSession, email: str):
+    return await session.scalar(select(User).where(User.email == email))
+
+
+def invalidate_token_version(user_id: int):
+    token_versions.pop(user_id)
+
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
     token: str = Depends(oauth2_scheme),
 ):
-    credentials_exception = HTTPException(
-        status_code=HTTPStatus.UNAUTHORIZED,
-        detail='Could not validate credentials',
-        headers={'WWW-Authenticate': 'Bearer'},
-    )
-    try:
-        payload = decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    with timed('auth'):
+        credentials_exception = HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail='Could not validate credentials',
+            headers={'WWW-Authenticate': 'Bearer'},
         )
-        user_email: str = payload.get('sub')
+        try:
+            payload = decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+            user_email: str = payload.get('sub')
 
-        if not user_email:
-            raise credentials_exception
+            if not user_email:
+                raise credentials_exception
 
-    except ExpiredSignatureError as signature_exc:
-        raise credentials_exception from signature_exc
+        except ExpiredSignatureError as signature_exc:
+            raise credentials_exception from signature_exc
 
-    except PyJWTError as py_jwt_exc:
-        raise credentials_exception from py_jwt_exc
+        except PyJWTError as py_jwt_exc:
+            raise credentials_exception from py_jwt_exc
 
-    user = session.scalar(select(User).where(User.email == user_email))
+        user_id = payload.get('uid')
+        token_version = payload.get('ver')
 
-    if not user:
-        raise credentials_exception
+        if settings.STATELESS_AUTH and user_id is not None:
+            if await get_token_version(session, user_id) != token_version:
+                raise credentials_exception
+
+            return Principal(
+                id=user_id, email=user_email, token_version=token_version
+            )
+
+        user = await get_user_by_email(session, user_email)
+
+        # Tokens are only revoked by version in stateless mode, the
+        # default one keeps accepting them while the email matches.
+        if not user:
+            raise credentials_exception
 
-    return user
+        return user
@@ -0,0 +1,207 @@
+"""Synthetic users and todos for capacity testing.
+
+    python -m app.cli seed --users 100000 --todos 100000000 --workers 8
+
+Rows are generated in fixed size batches, each from a random generator
+seeded with the seed and the batch number, and get explicit ids after
+the largest existing ones. The same seed thus gives the same rows
+whatever the number of workers. Each worker process loads its batches
+over its own connection, with COPY on psycopg and multi-row INSERTs
+elsewhere; SQLite has a single writer, so it gets a single worker.
+
+Every user has the password `PASSWORD`, hashed once. Todo owners are
+drawn from a power law of exponent `skew`: 0 spreads the todos evenly,
+1 and above piles most of them on the first users. The todo counters
+are rebuilt once everything is loaded.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import lru_cache, partial
+from math import ceil
+from multiprocessing import get_context
+from random import Random
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.counters import reconcile_counts
+from app.hashing import get_password_hash
+from app.models.todos import ToDo, ToDoStatus
+from app.models.users import User
+
+PASSWORD = 'seeded-password'
+WORDS = """
+    alpha api backlog batch bug build cache call check clean client code
+    commit config data deploy design doc draft email error event feature
+    file fix flow form graph handler index issue job key label layout
+    limit list log merge meeting metric model module note order page
+    patch plan pool query queue release report request review route run
+    schema script search server service session sprint table task team
+    test ticket token update user version view write
+""".split()
+
+USER_COLUMNS = ('id', 'username', 'email', 'password')
+TODO_COLUMNS = ('id', 'title', 'description', 'status', 'user_id')
+
+
+@dataclass(frozen=True, slots=True)
+class SeedPlan:
+    users: int
+    todos: int
+    seed: int = 0
+    batch_size: int = 10_000
+    # Relative weights, statuses left out are never picked.
+    statuses: dict[ToDoStatus, float] = field(
+        default_factory=lambda: dict.fromkeys(ToDoStatus, 1)
+    )
+    title_length: tuple[int, int] = (10, 60)
+    description_length: tuple[int, int] = (20, 200)
+    skew: float = 0
+    username_prefix: str = 'seeded_'
+    # Filled in by `seed`.
+    first_user_id: int = 1
+    first_todo_id: int = 1
+    password_hash: str = ''
+
+
+def words(rng: Random, lengths: tuple[int, int]) -> str:
+    """Random words cut to a length picked in `lengths`. A space left at
+    the cut becomes a full stop."""
+    length = rng.randint(*lengths)
+    # Words and their space take at least 4 characters.
+    text = ' '.join(rng.choices(WORDS, k=length // 4 + 1))
+    return text[:length].rstrip().ljust(length, '.')
+
+
+def owner_rank(u: float, users: int, skew: float) -> int:
+    """Inverse CDF of the power law: the rank, 0 being the busiest, of
+    the user owning a todo, for `u` uniform in [0, 1)."""
+    top = users + 1
+    if skew == 1:
+        rank = top**u
+    else:
+        rank = ((top ** (1 - skew) - 1) * u + 1) ** (1 / (1 - skew))
+    return min(int(rank), users) - 1
+
+
+def batch_range(total: int, plan: SeedPlan, batch: int) -> range:
+    start = batch * plan.batch_size
+    return range(start, min(start + plan.batch_size, total))
+
+
+def user_rows(plan: SeedPlan, batch: int):
+    for number in batch_range(plan.users, plan, batch):
+        id = plan.first_user_id + number
+        username = f'{plan.username_prefix}{id}'
+        yield id, username, f'{username}@example.com', plan.password_hash
+
+
+def todo_rows(plan: SeedPlan, batch: int):
+    rng = Random(f'{plan.seed}:todos:{batch}')
+    numbers = batch_range(plan.todos, plan, batch)
+    statuses = rng.choices(
+        list(plan.statuses),
+        weights=list(plan.statuses.values()),
+        k=len(numbers),
+    )
+    for number, status in zip(numbers, statuses):
+        yield (
+            plan.first_todo_id + number,
+            words(rng, plan.title_length),
+            words(rng, plan.description_length),
+            status.value,
+            plan.first_user_id
+            + owner_rank(rng.random(), plan.users, plan.skew),
+        )
+
+
+TABLES = {
+    'users': (User.__table__, USER_COLUMNS, user_rows),
+    'todos': (ToDo.__table__, TODO_COLUMNS, todo_rows),
+}
+
+
+@lru_cache
+def worker_engine(url: str):
+    return create_engine(url, poolclass=NullPool)
+
+
+def load_batch(url: str, plan: SeedPlan, table_name: str, batch: int) -> int:
+    """Generates and loads one batch, returns how many rows it held."""
+    engine = worker_engine(url)
+    table, columns, generate = TABLES[table_name]
+    rows = list(generate(plan, batch))
+
+    if engine.dialect.driver == 'psycopg':
+        connection = engine.raw_connection()
+        try:
+            with (
+                connection.cursor() as cursor,
+                cursor.copy(
+                    f'COPY {table.name} ({", ".join(columns)}) FROM STDIN'
+                ) as copy,
+            ):
+                for row in rows:
+                    copy.write_row(row)
+            connection.commit()
+        finally:
+            connection.close()
+    else:
+        with engine.begin() as connection:
+            connection.execute(
+                insert(table), [dict(zip(columns, row)) for row in rows]
+            )
+
+    return len(rows)
+
+
+def seed(engine, plan: SeedPlan, workers: int = 1) -> SeedPlan:
+    """Loads the users, then the todos of `plan`. Returns the plan with
+    the ids and hash it was run with."""
+    if plan.todos and not plan.users:
+        raise ValueError('Todos need users to belong to.')
+
+    with Session(engine) as session:
+        plan = replace(
+            plan,
+            first_user_id=session.scalar(
+                select(func.coalesce(func.max(User.id), 0) + 1)
+            ),
+            first_todo_id=session.scalar(
+                select(func.coalesce(func.max(ToDo.id), 0) + 1)
+            ),
+            password_hash=get_password_hash(PASSWORD),
+        )
+
+    url = engine.url.render_as_string(hide_password=False)
+    if engine.dialect.name == 'sqlite':
+        workers = 1
+
+    for table_name, total in (('users', plan.users), ('todos', plan.todos)):
+        task = partial(load_batch, url, plan, table_name)
+        batches = range(ceil(total / plan.batch_size))
+        if workers > 1:
+            # Like the hashing pool, don't fork a process holding
+            # connections and threads.
+            with ProcessPoolExecutor(
+                workers, mp_context=get_context('spawn')
+            ) as pool:
+                list(pool.map(task, batches))
+        else:
+            list(map(task, batches))
+
+    with Session(engine) as session:
+        if engine.dialect.name == 'postgresql':
+            # The ids were given explicitly, move the sequences past them.
+            for table_name in TABLES:
+                session.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table_name}',"
+                        f" 'id'), (SELECT max(id) FROM {table_name}))"
+                    )
+                )
+        reconcile_counts(session)
+
+    return plan
@@ -0,0 +1,35 @@
+"""Fast JSON encoding for large list responses.
+
+The list endpoints select plain column tuples and encode them here
+directly instead of going through `response_model` validation of ORM
+objects. The output is byte for byte what FastAPI's `JSONResponse`
+would render for the same `response_model`.
+"""
+
+import orjson
+from fastapi import Response
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, the same bytes `JSONResponse.render` gives."""
+    return orjson.dumps(content)
+
+
+def todo_dict(fields, row):
+    """A todo row selected as `fields`, in that order."""
+    return {
+        field: value.value if field == 'status' else value
+        for field, value in zip(fields, row)
+    }
+
+
+def user_dict(id, username, email):
+    """A user row in `UserPublic` field order."""
+    return {'id': id, 'username': username, 'email': email}
+
+
+def json_response(content, headers=None) -> Response:
+    """JSON response of `content`, or of `content` already encoded."""
+    if not isinstance(content, bytes):
+        content = dumps(content)
+    return Response(content, media_type='application/json', headers=headers)
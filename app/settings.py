@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,6 +10,86 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str
+    DATABASE_ASYNC_URL: str | None = None
+    # GET requests are served from these when set, see app/db/routing.py
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_REPLICA_BALANCING: Literal['round_robin', 'least_connections'] = (
+        'round_robin'
+    )
+    DB_READ_YOUR_WRITES_SECONDS: float = 5
+    # Pooling applies to servers only, SQLite keeps SQLAlchemy's pools.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_PREPARE_THRESHOLD: int = 1
+    # Connections each engine opens at startup, see app/warmup.py.
+    DB_POOL_WARM_CONNECTIONS: int = 1
+
+    # Statements a request may run, keyed by 'METHOD /route/template'.
+    # 0 means no budget.
+    QUERY_BUDGETS: dict[str, int] = {
+        'POST /v1/auth/token': 2,
+        'POST /v1/users/': 1,
+        'GET /v1/users/': 1,
+        'GET /v1/users/{user_id}': 1,
+        'GET /v1/todos/': 3,
+        'GET /v1/todos/stats': 2,
+        'POST /v1/todos/': 5,
+        # SQLite reads the old status before updating it.
+        'PATCH /v1/todos/{todo_id}': 5,
+        'DELETE /v1/todos/{todo_id}': 4,
+    }
+    QUERY_BUDGET_DEFAULT: int = 20
+    QUERY_BUDGET_STRICT: bool = False
+    SERVER_TIMING: bool = True
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_IN_MINUTES: int
+    STATELESS_AUTH: bool = False
+    TOKEN_VERSION_CACHE_TTL: float = 30
+
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    HASH_WORKERS: int = 2
+    HASH_QUEUE_LIMIT: int = 64
+
+    # Token buckets per client address and per username, as
+    # 'N/second|minute|hour|day' by route like QUERY_BUDGETS.
+    # See app/ratelimit.py, 'redis' needs RATE_LIMIT_URL.
+    RATE_LIMITS: dict[str, dict[Literal['ip', 'username'], str]] = {
+        'POST /v1/auth/token': {'ip': '30/minute', 'username': '10/minute'},
+        'POST /v1/users/': {'ip': '10/minute'},
+    }
+    RATE_LIMIT_BACKEND: Literal['none', 'memory', 'redis'] = 'memory'
+    RATE_LIMIT_URL: str | None = None
+    RATE_LIMIT_MAXSIZE: int = 100_000
+
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_ENCODINGS: list[str] = ['zstd', 'br', 'gzip']
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_GZIP_LEVEL: int = 6
+
+    # Cache of todo list pages, see app/cache.py. 'redis' needs CACHE_URL.
+    CACHE_BACKEND: Literal['none', 'memory', 'redis'] = 'memory'
+    CACHE_URL: str | None = None
+    CACHE_TTL: float = 60
+    CACHE_MAXSIZE: int = 10_000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    TODOS_PAGE_SIZE_MAX: int = 100
+    TODOS_BATCH_SIZE_MAX: int = 5000
+    TODOS_EXPORT_CHUNK_SIZE: int = 1000
+    TODOS_IMPORT_CHUNK_SIZE: int = 1000
+    TODOS_IMPORT_MAX_ERRORS: int = 100
+    TODOS_IMPORT_MAX_RECORD_LENGTH: int = 64 * 1024
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """The settings, read from the environment once per process."""
+    return Settings()
@@ -0,0 +1,86 @@
+"""Startup work that would otherwise fall on the first requests.
+
+`warm_up` runs in the background once the app starts, see
+app/endpoints/health.py for the readiness it drives. It
+
+- opens `DB_POOL_WARM_CONNECTIONS` connections on every engine, which
+  go back to the pools idle,
+- runs the hot lookups once on each of them, so SQLAlchemy has their
+  SQL compiled and cached and, on psycopg, they count towards being
+  prepared,
+- starts the password hashing workers,
+- builds the OpenAPI schema.
+
+Pydantic builds the response model validators when the models are
+defined and FastAPI the response fields when it registers the routes,
+so they need no warming up. Failing to connect is retried until the
+database answers.
+"""
+
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.counters import read_counts
+from app.db import database
+from app.endpoints.todos import get_todos_version
+from app.hashing import hashing_pool
+from app.security import Principal, get_token_version, get_user_by_email
+
+logger = logging.getLogger(__name__)
+
+# Lookups made by most requests, run with ids that match nothing.
+HOT_QUERIES = (
+    lambda session: get_user_by_email(session, ''),
+    lambda session: get_token_version(session, 0),
+    lambda session: get_todos_version(
+        session, Principal(id=0, email='', token_version=0)
+    ),
+    lambda session: read_counts(session, 0),
+)
+RETRY_SECONDS_MAX = 30
+
+
+async def run_hot_queries(connection):
+    for query in HOT_QUERIES:
+        async with AsyncSession(bind=connection) as session:
+            try:
+                await query(session)
+            except DBAPIError:
+                # Still compiled and cached, the schema may just be
+                # missing tables yet.
+                logger.warning('Warmup query failed', exc_info=True)
+            await session.rollback()
+
+
+async def warm_pool(engine, connections: int):
+    """Holds `connections` connections of `engine` at once, so that many
+    are open, and runs the hot queries on each."""
+    async with AsyncExitStack() as stack:
+        opened = [
+            await stack.enter_async_context(engine.connect())
+            for _ in range(max(connections, 1))
+        ]
+        await asyncio.gather(*map(run_hot_queries, opened))
+
+
+async def warm_up(app, settings):
+    router = database.replica_router
+    connections = min(settings.DB_POOL_WARM_CONNECTIONS, settings.DB_POOL_SIZE)
+    delay = 1
+    while True:
+        try:
+            for engine in (router.primary, *router.replicas):
+                await warm_pool(engine, connections)
+            break
+        except (OSError, SQLAlchemyError):
+            logger.exception('Database warmup failed, retrying in %ss', delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_SECONDS_MAX)
+
+    await hashing_pool.warm_up()
+    app.openapi()
+    logger.info('Warmup done')
@@ -0,0 +1,79 @@
+"""CPU cost versus bytes saved for each encoding on todo list payloads.
+
+Payloads are `ToDoList` bodies of Faker generated todos, as returned by
+GET /v1/todos. For every encoding and level this prints the compressed
+size, the ratio and the time spent compressing, as JSON lines.
+
+    python -m benchmarks.compression --items 10 100 1000
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+from faker import Faker
+
+from app.compression import COMPRESSORS
+from app.models.todos import ToDoStatus
+
+LEVELS = {
+    'gzip': [1, 6, 9],
+    'br': [1, 4, 8, 11],
+    'zstd': [1, 3, 9, 19],
+}
+
+
+def todo_list_payload(items: int, seed: int = 0) -> bytes:
+    fake = Faker()
+    fake.seed_instance(seed)
+    statuses = list(ToDoStatus)
+    todos = [
+        {
+            'title': fake.sentence(),
+            'description': fake.paragraph(nb_sentences=6),
+            'status': statuses[index % len(statuses)].value,
+            'id': index + 1,
+        }
+        for index in range(items)
+    ]
+    return json.dumps(
+        {'todos': todos, 'next_cursor': None}, separators=(',', ':')
+    ).encode()
+
+
+def measure(encoding: str, level: int, payload: bytes, rounds: int):
+    start = perf_counter()
+    for _ in range(rounds):
+        compressor = COMPRESSORS[encoding](level)
+        compressed = compressor.compress(payload) + compressor.finish()
+    elapsed = (perf_counter() - start) / rounds
+
+    return {
+        'encoding': encoding,
+        'level': level,
+        'bytes': len(payload),
+        'compressed_bytes': len(compressed),
+        'ratio': round(len(payload) / len(compressed), 2),
+        'ms': round(elapsed * 1000, 3),
+        'mb_per_second': round(len(payload) / elapsed / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--items', type=int, nargs='+', default=[10, 100, 1000]
+    )
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    for items in args.items:
+        payload = todo_list_payload(items)
+        for encoding in COMPRESSORS:
+            for level in LEVELS[encoding]:
+                result = measure(encoding, level, payload, args.rounds)
+                print(json.dumps({'items': items, **result}))
+
+
+if __name__ == '__main__':
+    main()
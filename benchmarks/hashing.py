@@ -0,0 +1,74 @@
+"""Login throughput versus hashing pool size.
+
+Each login costs one Argon2 verification, so this drives
+`app.hashing.check_password` with many concurrent callers and reports
+how many verifications per second each `HASH_WORKERS` value sustains,
+plus the p99 wait seen by a caller.
+
+    python -m benchmarks.hashing --workers 0 1 2 4 --logins 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+from time import perf_counter
+
+from app import hashing
+from app.hashing import HashingPool, get_password_hash
+
+
+async def _run(workers: int, logins: int, concurrency: int, hashed: str):
+    hashing.hashing_pool = HashingPool(workers, queue_limit=logins)
+    # Start the worker processes outside of the measurement.
+    await asyncio.gather(
+        *(
+            hashing.check_password('password', hashed)
+            for _ in range(max(workers, 1))
+        )
+    )
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def login():
+        async with semaphore:
+            start = perf_counter()
+            await hashing.check_password('password', hashed)
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = perf_counter() - start
+    hashing.hashing_pool.shutdown()
+
+    return {
+        'workers': workers,
+        'logins': logins,
+        'concurrency': concurrency,
+        'logins_per_second': round(logins / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(statistics.quantiles(latencies, n=100)[98] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--workers', type=int, nargs='+', default=[0, 1, 2, os.cpu_count()]
+    )
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    hashed = get_password_hash('password')
+    for workers in args.workers:
+        result = asyncio.run(
+            _run(workers, args.logins, args.concurrency, hashed)
+        )
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""Load test of the API endpoints.
+
+`seed` fills the database with `UserFactory` and `ToDoFactory` from the
+tests, the same data for the same --seed. `run` drives the app with
+concurrent clients, in process through httpx's ASGI transport or, with
+--server, over HTTP against a uvicorn started on localhost, and prints
+requests per second and latency percentiles per endpoint as JSON.
+`compare` tells two such reports apart, exiting with 1 on regressions.
+
+    python -m benchmarks.load seed --users 10000 --todos 1000000
+    python -m benchmarks.load run --requests 2000 --concurrency 32 \\
+        --output before.json
+    python -m benchmarks.load run --server --workers 4 --output after.json
+    python -m benchmarks.load compare before.json after.json
+
+The database is DATABASE_URL, as for the app: SQLite, or a local
+Postgres. Rate limiting is turned off, the clients all share an address.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+from itertools import count
+from time import perf_counter, sleep
+from uuid import uuid4
+
+import factory
+import httpx
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import ratelimit
+from app.app import app
+from app.counters import reconcile_counts
+from app.db.database import engine
+from app.hashing import get_password_hash
+from app.models import table_registry
+from app.models.todos import ToDo
+from app.models.users import User
+from app.security import create_access_token, token_claims
+from tests.conftest import ToDoFactory, UserFactory
+
+# Every seeded user has this password, hashed once.
+PASSWORD = 'benchmark-password'
+SAMPLE_USERS = 1000
+
+
+def seed(users: int, todos: int, seed: int = 0, chunk: int = 10_000):
+    """Recreates the tables with `users` users and `todos` todos spread
+    evenly among them."""
+    factory.random.reseed_random(seed)
+    UserFactory.reset_sequence()
+    password = get_password_hash(PASSWORD)
+
+    table_registry.metadata.drop_all(engine)
+    table_registry.metadata.create_all(engine)
+    with Session(engine) as session:
+        for start in range(0, users, chunk):
+            session.execute(
+                insert(User),
+                [
+                    {
+                        'username': user.username,
+                        'email': user.email,
+                        'password': password,
+                    }
+                    for user in UserFactory.build_batch(
+                        min(chunk, users - start)
+                    )
+                ],
+            )
+        for start in range(0, todos, chunk):
+            rows = factory.build_batch(
+                dict, min(chunk, todos - start), FACTORY_CLASS=ToDoFactory
+            )
+            for number, row in enumerate(rows, start):
+                row['user_id'] = number % users + 1
+            session.execute(insert(ToDo), rows)
+        session.commit()
+        reconcile_counts(session)
+
+
+def endpoints(users, tokens, run_id: str):
+    """Request makers by endpoint name, each taking the request number
+    and returning the method, URL and httpx arguments."""
+
+    def auth(number):
+        return {'Authorization': f'Bearer {tokens[number % len(tokens)]}'}
+
+    serial = count()
+
+    def new_user():
+        name = f'load_{run_id}_{next(serial)}'
+        return {
+            'username': name,
+            'email': f'{name}@email.com',
+            'password': PASSWORD,
+        }
+
+    return {
+        'login': lambda n: (
+            'POST',
+            '/v1/auth/token',
+            {
+                'data': {
+                    'username': users[n % len(users)].email,
+                    'password': PASSWORD,
+                }
+            },
+        ),
+        'create_user': lambda n: ('POST', '/v1/users/', {'json': new_user()}),
+        'current_user': lambda n: (
+            'POST',
+            '/v1/auth/refresh_token',
+            {'headers': auth(n)},
+        ),
+        'read_users': lambda n: ('GET', '/v1/users/?limit=20', {}),
+        'list_todos': lambda n: (
+            'GET',
+            '/v1/todos/?limit=20',
+            {'headers': auth(n)},
+        ),
+        'todo_stats': lambda n: (
+            'GET',
+            '/v1/todos/stats',
+            {'headers': auth(n)},
+        ),
+        'create_todo': lambda n: (
+            'POST',
+            '/v1/todos/',
+            {
+                'headers': auth(n),
+                'json': {'title': 't', 'description': 'd', 'status': 'todo'},
+            },
+        ),
+    }
+
+
+async def drive(client, make_request, requests: int, concurrency: int):
+    """Sends `requests` requests, `concurrency` at a time."""
+    latencies = []
+    errors = 0
+    numbers = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for number in numbers:
+            method, url, kwargs = make_request(number)
+            start = perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(perf_counter() - start)
+            errors += response.is_error
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'requests': requests,
+        'errors': errors,
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p95_ms': round(percentiles[94] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int):
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'uvicorn',
+            'app.app:app',
+            '--port',
+            str(port),
+            '--workers',
+            str(workers),
+            '--log-level',
+            'warning',
+        ],
+        env={**os.environ, 'RATE_LIMIT_BACKEND': 'none'},
+    )
+    for _ in range(300):
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/')
+            return server
+        except httpx.TransportError:
+            sleep(0.1)
+    server.terminate()
+    raise RuntimeError('uvicorn did not start')
+
+
+async def run(args, names):
+    with Session(engine) as session:
+        users = session.execute(
+            select(User.id, User.email, User.token_version)
+            .order_by(User.id)
+            .limit(SAMPLE_USERS)
+        ).all()
+    if not users:
+        raise SystemExit('No users, seed the database first.')
+    tokens = [create_access_token(data=token_claims(user)) for user in users]
+    makers = endpoints(users, tokens, uuid4().hex[:8])
+
+    server = None
+    if args.server:
+        port = free_port()
+        server = start_server(port, args.workers)
+        client = httpx.AsyncClient(
+            base_url=f'http://127.0.0.1:{port}',
+            limits=httpx.Limits(max_connections=args.concurrency),
+            timeout=60,
+        )
+    else:
+        ratelimit.limiter = None
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url='http://benchmark',
+            timeout=60,
+        )
+
+    results = {}
+    try:
+        async with client:
+            for name in names:
+                await drive(
+                    client, makers[name], args.warmup, args.concurrency
+                )
+                results[name] = await drive(
+                    client, makers[name], args.requests, args.concurrency
+                )
+                print(json.dumps({'endpoint': name, **results[name]}))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    return {
+        'meta': {
+            'mode': 'server' if args.server else 'in-process',
+            'workers': args.workers if args.server else None,
+            'database': engine.dialect.name,
+            'concurrency': args.concurrency,
+            'python': platform.python_version(),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(before: dict, after: dict, threshold: float):
+    """Relative change of each endpoint's throughput and p95 latency.
+    Returns whether any got worse by more than `threshold`."""
+    regressed = False
+    for name, old in before['endpoints'].items():
+        new = after['endpoints'].get(name)
+        if new is None:
+            continue
+        rps = new['rps'] / old['rps'] - 1
+        p95 = new['p95_ms'] / old['p95_ms'] - 1
+        worse = rps < -threshold or p95 > threshold
+        regressed = regressed or worse
+        print(
+            json.dumps({
+                'endpoint': name,
+                'rps': [old['rps'], new['rps']],
+                'rps_change': round(rps, 3),
+                'p95_ms': [old['p95_ms'], new['p95_ms']],
+                'p95_change': round(p95, 3),
+                'regressed': worse,
+            })
+        )
+    return regressed
+
+
+def load_report(path: str) -> dict:
+    with open(path, encoding='utf-8') as report:
+        return json.load(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seeding = commands.add_parser('seed', help='recreate and fill the db')
+    seeding.add_argument('--users', type=int, default=1000)
+    seeding.add_argument('--todos', type=int, default=100_000)
+    seeding.add_argument('--seed', type=int, default=0)
+
+    running = commands.add_parser('run', help='load the endpoints')
+    running.add_argument('--endpoints', nargs='+')
+    running.add_argument('--requests', type=int, default=1000)
+    running.add_argument('--warmup', type=int, default=50)
+    running.add_argument('--concurrency', type=int, default=16)
+    running.add_argument('--server', action='store_true')
+    running.add_argument('--workers', type=int, default=1)
+    running.add_argument('--output')
+
+    comparing = commands.add_parser('compare', help='diff two reports')
+    comparing.add_argument('before')
+    comparing.add_argument('after')
+    comparing.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        start = perf_counter()
+        seed(args.users, args.todos, args.seed)
+        print(
+            json.dumps({
+                'users': args.users,
+                'todos': args.todos,
+                'seconds': round(perf_counter() - start, 1),
+            })
+        )
+    elif args.command == 'run':
+        names = args.endpoints or list(endpoints((), (), ''))
+        report = asyncio.run(run(args, names))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+    else:
+        sys.exit(
+            compare(
+                load_report(args.before),
+                load_report(args.after),
+                args.threshold,
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Encoding a page of todos through `response_model` versus the fast path.
+
+The `response_model` path is what FastAPI does for a handler returning
+ORM objects: validate them into `ToDoList`, dump that to JSON-able data
+and render it with `JSONResponse`. The fast path encodes the selected
+column tuples directly, see app/serialization.py. Both must give the same
+bytes, this prints pages per second for each as JSON lines.
+
+    python -m benchmarks.serialization --items 50 500
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+
+from faker import Faker
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.models.todos import ToDo, ToDoStatus
+from app.schemas.todos import ToDoList, ToDoPublic
+from app.serialization import dumps, todo_dict
+
+
+def todo_rows(items: int, seed: int = 0):
+    fake = Faker()
+    fake.seed_instance(seed)
+    statuses = list(ToDoStatus)
+    return [
+        (
+            fake.sentence(),
+            fake.paragraph(nb_sentences=6),
+            statuses[index % len(statuses)],
+            index + 1,
+        )
+        for index in range(items)
+    ]
+
+
+def todo_objects(rows):
+    todos = []
+    for title, description, status, id in rows:
+        todo = ToDo(
+            title=title, description=description, status=status, user_id=1
+        )
+        todo.id = id
+        todos.append(todo)
+    return todos
+
+
+FIELDS = tuple(ToDoPublic.model_fields)
+RESPONSE_FIELD = create_model_field('Response_list_todos', ToDoList)
+loop = asyncio.new_event_loop()
+
+
+def response_model_path(todos) -> bytes:
+    content = loop.run_until_complete(
+        serialize_response(
+            field=RESPONSE_FIELD,
+            response_content={'todos': todos, 'next_cursor': None},
+        )
+    )
+    return JSONResponse(content).body
+
+
+def fast_path(rows) -> bytes:
+    return dumps({
+        'todos': [todo_dict(FIELDS, row) for row in rows],
+        'next_cursor': None,
+    })
+
+
+def measure(encode, data, rounds: int) -> float:
+    start = perf_counter()
+    for _ in range(rounds):
+        encode(data)
+    return rounds / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    for items in args.items:
+        rows = todo_rows(items)
+        todos = todo_objects(rows)
+        assert response_model_path(todos) == fast_path(rows)
+
+        baseline = measure(response_model_path, todos, args.rounds)
+        fast = measure(fast_path, rows, args.rounds)
+        print(
+            json.dumps({
+                'items': items,
+                'response_model_pages_per_second': round(baseline, 1),
+                'fast_pages_per_second': round(fast, 1),
+                'speedup': round(fast / baseline, 2),
+            })
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,14 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = table_registry.metadata
 
+# Search indexes and the FTS5 table are created by hand (see
+# app/models/todos.py), keep autogenerate from trying to drop them.
+UNMANAGED_OBJECTS = ('ix_todos_search', 'todos_fts')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and name and name.startswith(UNMANAGED_OBJECTS))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -49,6 +57,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -72,7 +81,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,42 @@
+"""Adds todos (user_id, id) index
+
+Revision ID: 3f9a1c2d7b64
+Revises: e7841bb43809
+Create Date: 2025-04-20 10:12:31.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c2d7b64'
+down_revision: Union[str, None] = 'e7841bb43809'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently on Postgres, so writes to todos go on meanwhile.
+    # That can't run in a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_todos_user_id_id',
+            'todos',
+            ['user_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_todos_user_id_id',
+            table_name='todos',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,75 @@
+"""Adds todos search index
+
+Revision ID: 9b2e6d4a1f07
+Revises: 3f9a1c2d7b64
+Create Date: 2025-04-22 18:03:55.120947
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2e6d4a1f07'
+down_revision: Union[str, None] = '3f9a1c2d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # Built concurrently, so writes to todos go on meanwhile. That
+        # can't run in a transaction.
+        with op.get_context().autocommit_block():
+            op.execute(
+                'CREATE INDEX CONCURRENTLY ix_todos_search ON todos USING gin '
+                "(to_tsvector('simple', title || ' ' || description))"
+            )
+
+    elif dialect == 'sqlite':
+        op.execute(
+            'CREATE VIRTUAL TABLE todos_fts USING fts5('
+            "title, description, content='todos', content_rowid='id')"
+        )
+        op.execute(
+            'CREATE TRIGGER todos_fts_ai AFTER INSERT ON todos BEGIN '
+            'INSERT INTO todos_fts(rowid, title, description) '
+            'VALUES (new.id, new.title, new.description); END'
+        )
+        op.execute(
+            'CREATE TRIGGER todos_fts_ad AFTER DELETE ON todos BEGIN '
+            'INSERT INTO todos_fts(todos_fts, rowid, title, description) '
+            "VALUES ('delete', old.id, old.title, old.description); END"
+        )
+        op.execute(
+            'CREATE TRIGGER todos_fts_au AFTER UPDATE ON todos BEGIN '
+            'INSERT INTO todos_fts(todos_fts, rowid, title, description) '
+            "VALUES ('delete', old.id, old.title, old.description); "
+            'INSERT INTO todos_fts(rowid, title, description) '
+            'VALUES (new.id, new.title, new.description); END'
+        )
+        op.execute("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(
+                'ix_todos_search',
+                table_name='todos',
+                postgresql_concurrently=True,
+            )
+
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS todos_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS todos_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS todos_fts_ai')
+        op.execute('DROP TABLE IF EXISTS todos_fts')
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from contextlib import contextmanager
 from datetime import datetime
 
@@ -6,15 +7,21 @@ import pytest
 from factory import fuzzy
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 from testcontainers.postgres import PostgresContainer
 
-from app.app import app
+from app import profiling, ratelimit
+from app.app import app, settings
+from app.cache import MemoryBackend
 from app.db.database import get_session
+from app.endpoints import todos
+from app.hashing import get_password_hash
 from app.models import table_registry
 from app.models.todos import ToDo, ToDoStatus
 from app.models.users import User
-from app.security import get_password_hash
+from app.ratelimit import MemoryLimiter
 
 
 class UserFactory(factory.Factory):
@@ -37,9 +44,12 @@ class ToDoFactory(factory.Factory):
 
 
 @pytest.fixture
-def client(session):
-    def get_session_override():
-        return session
+def client(session, async_engine):
+    async def get_session_override():
+        async with AsyncSession(
+            async_engine, expire_on_commit=False
+        ) as async_session:
+            yield async_session
 
     with TestClient(app) as test_client:
         app.dependency_overrides[get_session] = get_session_override
@@ -57,6 +67,9 @@ def session(engine):
         yield session
 
     table_registry.metadata.drop_all(engine)
+    # Pooled connections keep prepared statements bound to the dropped
+    # enum types, so they can't be reused by the next test.
+    engine.dispose()
 
 
 @pytest.fixture(scope='session')
@@ -68,6 +81,71 @@ def engine():
             yield _engine
 
 
+@pytest.fixture(scope='session')
+def async_engine(engine):
+    # NullPool: each TestClient runs its own event loop, so connections
+    # must not outlive the request that opened them.
+    return create_async_engine(engine.url, poolclass=NullPool)
+
+
+@contextmanager
+def _count_queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', record)
+
+    yield statements
+
+    event.remove(engine.sync_engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def count_queries(async_engine):
+    """Records the statements the app runs inside a `with` block."""
+    return lambda: _count_queries(async_engine)
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budgets(monkeypatch):
+    """Fails any test whose requests go over their route's query budget."""
+    monkeypatch.setattr(settings, 'QUERY_BUDGET_STRICT', True)
+
+
+@pytest.fixture(autouse=True)
+def result_cache(monkeypatch):
+    """A fresh list cache, pages cached by a previous test would be served
+    as ids and todos versions start over with each database."""
+    cache = MemoryBackend(ttl=60, maxsize=100, max_bytes=2**20)
+    monkeypatch.setattr(todos, 'result_cache', cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch):
+    """Fresh rate limit buckets, requests of the test client all come from
+    the same address."""
+    limiter = MemoryLimiter()
+    monkeypatch.setattr(ratelimit, 'limiter', limiter)
+    return limiter
+
+
+@pytest.fixture
+def request_profiles():
+    """Profiles of the requests made in the test, by route key such as
+    'POST /v1/users/'. See app/profiling.py."""
+    profiles = defaultdict(list)
+
+    def record(key, profile):
+        profiles[key].append(profile)
+
+    profiling.listeners.append(record)
+    yield profiles
+    profiling.listeners.remove(record)
+
+
 @contextmanager
 def _mock_db_time(*, model, time=datetime(2024, 1, 1)):
     def fake_time_hook(mapper, connection, target):
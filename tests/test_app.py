@@ -1,8 +1,13 @@
+import asyncio
 from http import HTTPStatus
+from time import sleep
 
 from fastapi.testclient import TestClient
 
-from app.app import app
+from app import warmup
+from app.app import app, settings
+from app.db import database
+from app.db.routing import ReplicaRouter
 
 
 def test_root_should_return_hello_world():
@@ -12,3 +17,59 @@ def test_root_should_return_hello_world():
 
     assert response.status_code == HTTPStatus.OK
     assert response.json() == {'message': 'Hello World!'}
+
+
+def test_ready_once_warmed_up(
+    session, async_engine, count_queries, monkeypatch
+):
+    monkeypatch.setattr(
+        database, 'replica_router', ReplicaRouter(async_engine)
+    )
+    started = asyncio.Event()
+
+    async def warm_up(app, settings):
+        await started.wait()
+        await real_warm_up(app, settings)
+
+    real_warm_up = warmup.warm_up
+    monkeypatch.setattr('app.app.warm_up', warm_up)
+
+    with count_queries() as statements, TestClient(app) as client:
+        assert client.get('/health/live').status_code == HTTPStatus.OK
+        response = client.get('/health/ready')
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+        client.portal.call(started.set)
+        for _ in range(100):
+            response = client.get('/health/ready')
+            if response.status_code == HTTPStatus.OK:
+                break
+            sleep(0.1)
+
+    assert response.json() == {'status': 'ready'}
+    assert any('FROM todo_counters' in sql for sql in statements)
+    assert app.openapi_schema is not None
+
+
+def test_warm_up_retries_until_the_database_answers(monkeypatch):
+    attempts = []
+
+    async def warm_pool(engine, connections):
+        attempts.append(engine)
+        if len(attempts) == 1:
+            raise OSError('connection refused')
+
+    async def no_wait(seconds):
+        pass
+
+    async def no_hashing():
+        pass
+
+    monkeypatch.setattr(warmup, 'warm_pool', warm_pool)
+    monkeypatch.setattr(warmup.asyncio, 'sleep', no_wait)
+    monkeypatch.setattr(warmup.hashing_pool, 'warm_up', no_hashing)
+
+    asyncio.run(warmup.warm_up(app, settings))
+
+    expected_attempts = 2
+    assert len(attempts) == expected_attempts
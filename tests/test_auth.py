@@ -1,7 +1,10 @@
 from http import HTTPStatus
 
+import pytest
 from freezegun import freeze_time
 
+from app.security import settings, token_versions
+
 
 def test_get_token(client, user):
     response = client.post(
@@ -91,3 +94,82 @@ def test_token_expired_dont_refresh(client, user):
 
         assert response.status_code == HTTPStatus.UNAUTHORIZED
         token = response.json() == {'detail': 'Could not validate credentials'}
+
+
+@pytest.fixture
+def stateless_auth(monkeypatch):
+    monkeypatch.setattr(settings, 'STATELESS_AUTH', True)
+    token_versions.clear()
+    yield
+    token_versions.clear()
+
+
+def test_stateless_auth_skips_user_lookup(
+    client, token, stateless_auth, count_queries
+):
+    # Warm the token version cache.
+    client.get('/v1/todos/', headers={'Authorization': f'Bearer {token}'})
+
+    with count_queries() as statements:
+        response = client.post(
+            '/v1/auth/refresh_token',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    assert statements == []
+
+
+def test_stateless_auth_rejects_token_after_user_update(
+    client, user, token, stateless_auth
+):
+    response = client.put(
+        f'/v1/users/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': 'bob',
+            'email': 'bob@example.com',
+            'password': 'mynewpassword',
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_default_auth_keeps_token_after_user_update(client, user, token):
+    response = client.put(
+        f'/v1/users/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': 'bob',
+            'email': user.email,
+            'password': 'mynewpassword',
+        },
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_stateless_auth_rejects_token_after_user_delete(
+    client, user, token, stateless_auth
+):
+    client.get('/v1/todos/', headers={'Authorization': f'Bearer {token}'})
+    client.delete(
+        f'/v1/users/{user.id}', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
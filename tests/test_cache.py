@@ -0,0 +1,107 @@
+import asyncio
+from time import monotonic
+
+from fakeredis import FakeAsyncRedis
+from prometheus_client import REGISTRY
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.cache import MemoryBackend, RedisBackend
+from app.endpoints import todos
+from tests.conftest import ToDoFactory
+
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = MemoryBackend(ttl=60, maxsize=2, max_bytes=100)
+
+    async def scenario():
+        await cache.set('a', b'1')
+        await cache.set('b', b'2')
+        await cache.get('a')
+        await cache.set('c', b'3')
+        return [await cache.get(key) for key in ('a', 'b', 'c')]
+
+    assert asyncio.run(scenario()) == [b'1', None, b'3']
+
+
+def test_memory_backend_is_bounded_by_size():
+    cache = MemoryBackend(ttl=60, maxsize=10, max_bytes=10)
+
+    async def scenario():
+        await cache.set('a', b'x' * 6)
+        await cache.set('b', b'y' * 6)
+        await cache.set('huge', b'z' * 11)
+        return [await cache.get(key) for key in ('a', 'b', 'huge')]
+
+    assert asyncio.run(scenario()) == [None, b'y' * 6, None]
+    assert cache.size == len(b'y' * 6)
+
+
+def test_memory_backend_expires_entries(monkeypatch):
+    cache = MemoryBackend(ttl=1, maxsize=10, max_bytes=10)
+    asyncio.run(cache.set('a', b'1'))
+
+    later = monotonic() + 2
+    monkeypatch.setattr('app.cache.monotonic', lambda: later)
+
+    assert asyncio.run(cache.get('a')) is None
+    assert cache.size == 0
+
+
+def test_redis_backend_treats_errors_as_misses():
+    class BrokenRedis:
+        @staticmethod
+        async def get(key):
+            raise RedisConnectionError
+
+        @staticmethod
+        async def set(key, value, px):
+            raise RedisConnectionError
+
+    cache = RedisBackend(BrokenRedis(), ttl=60)
+
+    async def scenario():
+        await cache.set('a', b'1')
+        return await cache.get('a')
+
+    assert asyncio.run(scenario()) is None
+
+
+def cache_lookups(result):
+    return (
+        REGISTRY.get_sample_value(
+            'cache_requests_total', {'cache': 'todos', 'result': result}
+        )
+        or 0
+    )
+
+
+def test_list_todos_served_from_cache_until_a_write(  # noqa: PLR0913, PLR0917
+    session, client, user, token, request_profiles, monkeypatch
+):
+    monkeypatch.setattr(
+        todos, 'result_cache', RedisBackend(FakeAsyncRedis(), ttl=60)
+    )
+    headers = {'Authorization': f'Bearer {token}'}
+    session.add_all(ToDoFactory.create_batch(2, user_id=user.id))
+    session.commit()
+    hits, misses = cache_lookups('hit'), cache_lookups('miss')
+
+    first = client.get('/v1/todos/?status=todo&limit=5', headers=headers)
+    # Same parameters in another order.
+    second = client.get('/v1/todos/?limit=5&status=todo', headers=headers)
+
+    assert second.content == first.content
+    assert cache_lookups('miss') == misses + 1
+    assert cache_lookups('hit') == hits + 1
+    # The cached page only needed the user lookup.
+    assert [p.count for p in request_profiles['GET /v1/todos/']] == [2, 1]
+
+    client.post(
+        '/v1/todos/',
+        json={'title': 't', 'description': 'd', 'status': 'todo'},
+        headers=headers,
+    )
+    third = client.get('/v1/todos/?status=todo&limit=5', headers=headers)
+
+    assert cache_lookups('miss') == misses + 2
+    assert third.json()['todos'][-1]['title'] == 't'
@@ -0,0 +1,91 @@
+import gzip
+from http import HTTPStatus
+
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, negotiate_encoding
+
+BODY = b'{"todos": []}' * 200
+
+
+@pytest.mark.parametrize(
+    ('accept_encoding', 'expected'),
+    [
+        ('gzip, deflate, br, zstd', 'zstd'),
+        ('gzip;q=1.0, br;q=0.5', 'gzip'),
+        ('br, gzip', 'br'),
+        ('*', 'zstd'),
+        ('*, zstd;q=0', 'br'),
+        ('identity', None),
+        ('', None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    assert (
+        negotiate_encoding(accept_encoding, ['zstd', 'br', 'gzip']) == expected
+    )
+
+
+@pytest.fixture
+def compressed_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get('/big')
+    def big():
+        return StreamingResponse(iter([BODY]), media_type='application/json')
+
+    @app.get('/small')
+    def small():
+        return {'message': 'Hello World!'}
+
+    @app.get('/stream')
+    def stream():
+        return StreamingResponse(iter([b'a' * 10, b'b' * 10]))
+
+    return TestClient(app)
+
+
+def test_compresses_bodies_over_minimum_size(compressed_client):
+    response = compressed_client.get(
+        '/big', headers={'Accept-Encoding': 'gzip'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert response.content == BODY
+
+
+def test_skips_bodies_under_minimum_size(compressed_client):
+    response = compressed_client.get(
+        '/small', headers={'Accept-Encoding': 'gzip'}
+    )
+
+    assert 'content-encoding' not in response.headers
+    assert response.json() == {'message': 'Hello World!'}
+
+
+def test_compresses_streams_chunk_by_chunk(compressed_client):
+    with compressed_client.stream(
+        'GET', '/stream', headers={'Accept-Encoding': 'zstd'}
+    ) as response:
+        raw = b''.join(response.iter_raw())
+
+    assert response.headers['content-encoding'] == 'zstd'
+    assert 'content-length' not in response.headers
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    assert decompressor.decompress(raw) == b'a' * 10 + b'b' * 10
+
+
+def test_gzip_stream_is_valid_gzip(compressed_client):
+    with compressed_client.stream(
+        'GET', '/big', headers={'Accept-Encoding': 'gzip'}
+    ) as response:
+        raw = b''.join(response.iter_raw())
+
+    assert gzip.decompress(raw) == BODY
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import cli
+from app.counters import reconcile_counts
+from app.db.database import create_app_engine
+from app.endpoints.todos import update_todos
+from app.models import table_registry
+from app.models.todos import ToDo, ToDoStatus
+from tests.conftest import ToDoFactory, UserFactory
+
+
+def actual_counts(session, user_id):
+    counts = dict.fromkeys((status.value for status in ToDoStatus), 0)
+    counts.update(
+        (status.value, count)
+        for status, count in session.execute(
+            select(ToDo.status, func.count())
+            .where(ToDo.user_id == user_id)
+            .group_by(ToDo.status)
+        )
+    )
+    return counts
+
+
+def test_counters_follow_every_write(session, client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def todo(status):
+        return {'title': 't', 'description': 'd', 'status': status}
+
+    first = client.post('/v1/todos/', json=todo('draft'), headers=headers)
+    client.post('/v1/todos/', json=todo('todo'), headers=headers)
+    batch = client.post(
+        '/v1/todos/batch',
+        json=[todo('doing'), todo('doing'), todo('completed')],
+        headers=headers,
+    )
+    client.post(
+        '/v1/todos/import',
+        content='\n'.join(json.dumps(todo(s)) for s in ('trash', 'draft')),
+        headers=headers,
+    )
+    client.patch(
+        f'/v1/todos/{first.json()["id"]}',
+        json={'status': 'completed'},
+        headers=headers,
+    )
+    *doing, completed = [item['id'] for item in batch.json()['todos']]
+    client.patch(
+        '/v1/todos/bulk',
+        json={'ids': doing, 'changes': {'status': 'trash'}},
+        headers=headers,
+    )
+    client.request(
+        'DELETE',
+        '/v1/todos/bulk',
+        json={'filter': {'status': 'trash'}},
+        headers=headers,
+    )
+    client.delete(f'/v1/todos/{completed}', headers=headers)
+
+    response = client.get('/v1/todos/stats', headers=headers)
+
+    expected = actual_counts(session, user.id)
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'counts': expected,
+        'total': sum(expected.values()),
+    }
+    assert expected == {
+        'draft': 1,
+        'todo': 1,
+        'doing': 0,
+        'completed': 1,
+        'trash': 0,
+    }
+    assert reconcile_counts(session) == []
+
+
+def test_stats_revalidate_with_etag(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.get('/v1/todos/stats', headers=headers)
+
+    response = client.get(
+        '/v1/todos/stats',
+        headers={**headers, 'If-None-Match': response.headers['ETag']},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_reconcile_counters_command_fixes_drift(  # noqa: PLR0913, PLR0917
+    session, client, user, token, engine, monkeypatch, capsys
+):
+    session.add_all([
+        *ToDoFactory.create_batch(2, user_id=user.id, status='todo'),
+        ToDoFactory(user_id=user.id, status='doing'),
+    ])
+    session.commit()
+    monkeypatch.setattr(cli, 'engine', engine)
+
+    cli.main(['reconcile-counters', '--user-id', str(user.id)])
+
+    assert capsys.readouterr().out.splitlines() == [
+        f'user {user.id} doing: 0 -> 1',
+        f'user {user.id} todo: 0 -> 2',
+        '2 counters fixed',
+    ]
+    response = client.get(
+        '/v1/todos/stats', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.json()['counts'] == actual_counts(session, user.id)
+
+
+def test_update_todos_returns_old_status_on_sqlite(tmp_path):
+    url = f'sqlite:///{tmp_path / "todos"}.db'
+    sync_engine = create_engine(url)
+    table_registry.metadata.create_all(sync_engine)
+    with Session(sync_engine) as session:
+        session.add(UserFactory())
+        session.add_all(ToDoFactory.create_batch(2, status='draft'))
+        session.commit()
+
+    async def scenario():
+        engine = create_app_engine(url.replace('sqlite', 'sqlite+aiosqlite'))
+        async with AsyncSession(engine) as session:
+            rows = await update_todos(
+                session,
+                (ToDo.user_id == 1,),
+                {'status': ToDoStatus.doing},
+                ToDo.id,
+                ToDo.status,
+            )
+        await engine.dispose()
+        return rows
+
+    assert sorted(asyncio.run(scenario())) == [
+        (1, ToDoStatus.doing, ToDoStatus.draft),
+        (2, ToDoStatus.doing, ToDoStatus.draft),
+    ]
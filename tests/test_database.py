@@ -0,0 +1,66 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db import database
+from app.db.database import InstrumentedPool, engine_options, pool_stats
+from app.settings import Settings
+
+
+def test_engine_options_leave_sqlite_alone():
+    assert engine_options('sqlite:///database.db', Settings()) == {}
+
+
+def test_engine_options_for_postgres():
+    settings = Settings(
+        DB_POOL_SIZE=20, DB_STATEMENT_TIMEOUT_MS=2500, DB_PREPARE_THRESHOLD=-1
+    )
+
+    options = engine_options('postgresql+psycopg://app@db/app', settings)
+
+    assert options['pool_size'] == settings.DB_POOL_SIZE
+    assert options['connect_args'] == {
+        'options': '-c statement_timeout=2500',
+        'prepare_threshold': None,
+    }
+
+
+def test_instrumented_pool_reports_starvation(engine, monkeypatch, client):
+    settings = Settings(
+        DB_POOL_SIZE=1,
+        DB_MAX_OVERFLOW=0,
+        DB_POOL_TIMEOUT=0.05,
+        DB_STATEMENT_TIMEOUT_MS=2500,
+    )
+    url = engine.url.render_as_string(hide_password=False)
+    pooled = create_async_engine(
+        url, poolclass=InstrumentedPool, **engine_options(url, settings)
+    )
+
+    async def scenario():
+        async with pooled.connect() as connection:
+            timeout = await connection.scalar(text('SHOW statement_timeout'))
+            with pytest.raises(PoolTimeout):
+                await pooled.connect()
+            stats = pool_stats(pooled.pool)
+        await pooled.dispose()
+        return timeout, stats
+
+    timeout, stats = asyncio.run(scenario())
+
+    assert timeout == '2500ms'
+    assert stats['checked_out'] == 1
+    assert stats['idle'] == 0
+    assert stats['timeouts'] == 1
+    assert stats['wait_seconds_max'] >= settings.DB_POOL_TIMEOUT
+
+    monkeypatch.setattr(database, 'async_engine', pooled)
+    response = client.get('/internal/pool')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['pool'] == 'InstrumentedPool'
+    assert response.json()['timeouts'] == 1
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from app.hashing import HashingPool, verify_password
+from tests.conftest import UserFactory
+
+
+def test_hashing_pool_rejects_calls_when_full():
+    pool = HashingPool(workers=0, queue_limit=0)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run(print)
+
+        release.set()
+        await busy
+        return exc_info.value
+
+    exc = asyncio.run(scenario())
+
+    assert exc.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert exc.headers == {'Retry-After': '1'}
+    assert pool.pending == 0
+
+
+def test_login_rehashes_password_made_with_old_parameters(session, client):
+    password = 'old-params'
+    old_hasher = PasswordHash((Argon2Hasher(time_cost=1, memory_cost=8192),))
+    user = UserFactory(password=old_hasher.hash(password))
+    session.add(user)
+    session.commit()
+    old_hash = user.password
+
+    response = client.post(
+        '/v1/auth/token', data={'username': user.email, 'password': password}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    session.refresh(user)
+    assert user.password != old_hash
+    assert 'm=8192,t=1' not in user.password
+    assert verify_password(password, user.password)
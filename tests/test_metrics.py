@@ -0,0 +1,66 @@
+from http import HTTPStatus
+
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_count_requests_by_route_template(client, user, token):
+    labels = {
+        'method': 'GET',
+        'route': '/v1/users/{user_id}',
+        'status': str(HTTPStatus.OK.value),
+    }
+    requests = sample('http_request_duration_seconds_count', **labels)
+    queries = sample(
+        'http_request_db_queries_sum', route='/v1/users/{user_id}'
+    )
+
+    response = client.get(f'/v1/users/{user.id}')
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    assert 'http_request_duration_seconds_bucket{' in response.text
+    assert sample('http_request_duration_seconds_count', **labels) == (
+        requests + 1
+    )
+    # The user lookup itself.
+    assert sample(
+        'http_request_db_queries_sum', route='/v1/users/{user_id}'
+    ) == (queries + 1)
+
+
+def test_metrics_share_a_label_for_unmatched_paths(client):
+    labels = {'method': 'GET', 'route': '<unmatched>', 'status': '404'}
+    before = sample('http_request_duration_seconds_count', **labels)
+
+    client.get('/no/such/path/1')
+    client.get('/no/such/path/2')
+
+    expected_requests = before + 2
+    assert (
+        sample('http_request_duration_seconds_count', **labels)
+        == expected_requests
+    )
+
+
+def test_metrics_time_password_hashing(client):
+    before = sample('password_hash_duration_seconds_count', operation='hash')
+
+    client.post(
+        '/v1/users/',
+        json={
+            'username': 'alice',
+            'email': 'alice@example.com',
+            'password': 'secret',
+        },
+    )
+
+    assert sample(
+        'password_hash_duration_seconds_count', operation='hash'
+    ) == (before + 1)
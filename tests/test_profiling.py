@@ -0,0 +1,56 @@
+import logging
+import re
+
+import pytest
+
+from app.app import settings
+from app.profiling import QueryBudgetExceeded, fingerprint
+
+
+def test_fingerprint_collapses_parameters():
+    assert (
+        fingerprint(
+            'SELECT todos.id FROM todos\n'
+            'WHERE todos.id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s) LIMIT 10'
+        )
+        == 'SELECT todos.id FROM todos WHERE todos.id IN (...) LIMIT ?'
+    )
+    assert fingerprint("SELECT 'a' WHERE x = 2") == 'SELECT ? WHERE x = ?'
+
+
+def test_server_timing_reports_db_and_auth(client, token):
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert re.fullmatch(
+        r'db;dur=\d+\.\d, auth;dur=\d+\.\d',
+        response.headers['Server-Timing'],
+    )
+
+
+def test_request_profiles_record_statements(client, token, request_profiles):
+    client.get('/v1/todos/', headers={'Authorization': f'Bearer {token}'})
+
+    (profile,) = request_profiles['GET /v1/todos/']
+    expected_statements = 2
+    assert profile.count == expected_statements
+    assert [rows for _, _, rows in profile.statements][-1] == 0
+    assert profile.timings['auth'] > 0
+
+
+def test_query_budget_fails_when_strict(client, token, monkeypatch):
+    monkeypatch.setitem(settings.QUERY_BUDGETS, 'GET /v1/todos/', 1)
+
+    with pytest.raises(QueryBudgetExceeded, match='GET /v1/todos/ ran 2'):
+        client.get('/v1/todos/', headers={'Authorization': f'Bearer {token}'})
+
+
+def test_query_budget_logs_when_not_strict(client, token, monkeypatch, caplog):
+    monkeypatch.setitem(settings.QUERY_BUDGETS, 'GET /v1/todos/', 1)
+    monkeypatch.setattr(settings, 'QUERY_BUDGET_STRICT', False)
+
+    with caplog.at_level(logging.WARNING, logger='app.profiling'):
+        client.get('/v1/todos/', headers={'Authorization': f'Bearer {token}'})
+
+    assert 'its budget is 1' in caplog.text
@@ -0,0 +1,117 @@
+import asyncio
+from http import HTTPStatus
+from time import monotonic
+
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from app.hashing import hashing_pool
+from app.ratelimit import MemoryLimiter, RedisLimiter, parse_rate, settings
+
+
+def test_parse_rate():
+    expected_capacity = 10
+    capacity, refill = parse_rate('10/minute')
+
+    assert capacity == expected_capacity
+    assert refill == expected_capacity / 60
+
+
+def test_memory_limiter_refills_over_time(monkeypatch):
+    limiter = MemoryLimiter()
+    now = monotonic()
+    monkeypatch.setattr('app.ratelimit.monotonic', lambda: now)
+
+    waits = [asyncio.run(limiter.take('a', 2, 0.5)) for _ in range(3)]
+
+    assert waits == [0, 0, 2]
+    monkeypatch.setattr('app.ratelimit.monotonic', lambda: now + 2)
+    assert asyncio.run(limiter.take('a', 2, 0.5)) == 0
+
+
+def test_redis_limiter_shares_buckets():
+    client = FakeAsyncRedis()
+
+    async def scenario():
+        first, second = RedisLimiter(client), RedisLimiter(client)
+        return [
+            await limiter.take('a', 2, 1) for limiter in (first, second, first)
+        ]
+
+    *allowed, rejected = asyncio.run(scenario())
+    assert allowed == [0, 0]
+    assert 0 < rejected <= 1
+
+
+def test_redis_limiter_lets_requests_through_when_down():
+    server = FakeServer()
+    server.connected = False
+    limiter = RedisLimiter(FakeAsyncRedis(server=server))
+
+    assert asyncio.run(limiter.take('a', 1, 1)) == 0
+
+
+def test_login_rejected_over_username_limit(
+    client, user, request_profiles, monkeypatch
+):
+    monkeypatch.setitem(
+        settings.RATE_LIMITS, 'POST /v1/auth/token', {'username': '2/minute'}
+    )
+
+    def login(username):
+        return client.post(
+            '/v1/auth/token',
+            data={'username': username, 'password': 'wrong'},
+        )
+
+    statuses = [login(user.email).status_code for _ in range(2)]
+    response = login(user.email.upper())
+
+    assert statuses == [HTTPStatus.BAD_REQUEST] * 2
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    # The bucket regains a token every 30 seconds.
+    expected_max_wait = 30
+    assert 0 < int(response.headers['Retry-After']) <= expected_max_wait
+    # Rejected before looking the user up.
+    assert request_profiles['POST /v1/auth/token'][-1].count == 0
+    assert login('other@example.com').status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_signup_rejected_over_address_limit(client, monkeypatch):
+    monkeypatch.setitem(
+        settings.RATE_LIMITS, 'POST /v1/users/', {'ip': '1/hour'}
+    )
+
+    def signup(name):
+        return client.post(
+            '/v1/users/',
+            json={
+                'username': name,
+                'email': f'{name}@example.com',
+                'password': 'secret',
+            },
+        )
+
+    assert signup('alice').status_code == HTTPStatus.CREATED
+    response = signup('bob')
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    expected_max_wait = 3600
+    assert 0 < int(response.headers['Retry-After']) <= expected_max_wait
+
+
+def test_login_shed_while_hashing_pool_is_full(
+    client, user, request_profiles, monkeypatch
+):
+    monkeypatch.setattr(
+        hashing_pool,
+        'pending',
+        max(hashing_pool.workers, 1) + hashing_pool.queue_limit,
+    )
+
+    response = client.post(
+        '/v1/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert request_profiles['POST /v1/auth/token'][-1].count == 0
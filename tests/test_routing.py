@@ -0,0 +1,99 @@
+from http import HTTPStatus
+from time import monotonic
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.app import app
+from app.db import database
+from app.db.database import create_app_engine
+from app.db.routing import ReplicaRouter
+from app.models import table_registry
+from app.security import create_access_token
+from tests.conftest import ToDoFactory, UserFactory
+
+
+def make_request(method='GET', authorization='Bearer a'):
+    return Request({
+        'type': 'http',
+        'method': method,
+        'headers': [(b'authorization', authorization.encode())],
+        'client': ('127.0.0.1', 1234),
+    })
+
+
+def test_router_balances_reads_round_robin():
+    router = ReplicaRouter('primary', ['a', 'b'])
+
+    picked = [router.engine_for(make_request()) for _ in range(4)]
+
+    assert picked == ['a', 'b', 'a', 'b']
+    assert router.engine_for(make_request('POST')) == 'primary'
+
+
+def test_router_balances_reads_by_least_connections():
+    router = ReplicaRouter('primary', ['a', 'b'], 'least_connections')
+    router.in_flight['a'] = 2
+    router.in_flight['b'] = 1
+
+    assert router.engine_for(make_request()) == 'b'
+
+
+def test_router_reads_own_writes_from_primary(monkeypatch):
+    router = ReplicaRouter('primary', ['a'], window=5)
+
+    router.record_write(make_request('POST'))
+
+    assert router.engine_for(make_request()) == 'primary'
+    assert router.engine_for(make_request(authorization='Bearer b')) == 'a'
+
+    later = monotonic() + 10
+    monkeypatch.setattr('app.cache.monotonic', lambda: later)
+    assert router.engine_for(make_request()) == 'a'
+
+
+@pytest.fixture
+def replicated(tmp_path, monkeypatch):
+    """A primary and a replica SQLite database holding the same user, the
+    primary also has a todo the replica hasn't received yet."""
+    user = UserFactory()
+    urls = []
+    for name in ('primary', 'replica'):
+        url = f'sqlite:///{tmp_path / name}.db'
+        sync_engine = create_engine(url)
+        table_registry.metadata.create_all(sync_engine)
+        with Session(sync_engine) as session:
+            session.add(UserFactory(username=user.username))
+            if name == 'primary':
+                session.add(ToDoFactory(user_id=1))
+            session.commit()
+        sync_engine.dispose()
+        urls.append(url.replace('sqlite://', 'sqlite+aiosqlite://'))
+
+    primary, replica = (create_app_engine(url) for url in urls)
+    monkeypatch.setattr(
+        database, 'replica_router', ReplicaRouter(primary, [replica])
+    )
+    token = create_access_token(data={'sub': user.email})
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_reads_go_to_primary_after_a_write(replicated):
+    with TestClient(app) as client:
+        response = client.get('/v1/todos/', headers=replicated)
+        assert response.json()['todos'] == []
+
+        response = client.post(
+            '/v1/todos/',
+            headers=replicated,
+            json={'title': 't', 'description': 'd', 'status': 'todo'},
+        )
+        assert response.status_code == HTTPStatus.OK
+
+        response = client.get('/v1/todos/', headers=replicated)
+
+    expected_todos = 2
+    assert len(response.json()['todos']) == expected_todos
@@ -0,0 +1,40 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import table_registry
+from app.models.todos import ToDo
+from app.search import search
+from tests.conftest import ToDoFactory
+
+
+def test_search_sqlite_fts5_ranks_matches():
+    engine = create_engine('sqlite://')
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add_all([
+            ToDoFactory(title='milk', description='milk milk'),
+            ToDoFactory(title='bread', description='bakery'),
+            ToDoFactory(title='buy milk', description='groceries'),
+        ])
+        session.commit()
+
+        query, score = search(select(ToDo), 'milk', 'sqlite')
+        todos = session.scalars(query.order_by(score.desc())).all()
+
+    assert [todo.title for todo in todos] == ['milk', 'buy milk']
+
+
+def test_search_sqlite_fts5_ignores_query_syntax():
+    engine = create_engine('sqlite://')
+    table_registry.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add(ToDoFactory(title='milk', description='x'))
+        session.commit()
+
+        query, _ = search(select(ToDo), 'milk OR "', 'sqlite')
+        assert session.scalars(query).all() == []
+
+        query, _ = search(select(ToDo), '***', 'sqlite')
+        assert session.scalars(query).all() == []
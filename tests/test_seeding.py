@@ -0,0 +1,85 @@
+from collections import Counter
+from http import HTTPStatus
+
+from sqlalchemy import func, select
+
+from app import cli
+from app.counters import reconcile_counts
+from app.models.todos import ToDo, ToDoStatus
+from app.models.users import User
+from app.seeding import PASSWORD, SeedPlan, owner_rank, todo_rows
+
+
+def test_todo_rows_depend_on_seed_and_batch_only():
+    plan = SeedPlan(users=10, todos=100, batch_size=30)
+
+    assert list(todo_rows(plan, 1)) == list(todo_rows(plan, 1))
+    assert list(todo_rows(plan, 1)) != list(todo_rows(plan, 2))
+    assert [len(list(todo_rows(plan, batch))) for batch in range(4)] == [
+        30,
+        30,
+        30,
+        10,
+    ]
+
+
+def test_todo_rows_follow_the_plan():
+    plan = SeedPlan(
+        users=10,
+        todos=500,
+        batch_size=500,
+        statuses={ToDoStatus.todo: 1, ToDoStatus.doing: 1},
+        title_length=(5, 8),
+    )
+
+    rows = list(todo_rows(plan, 0))
+
+    assert {status for *_, status, _ in rows} == {'todo', 'doing'}
+    assert all(5 <= len(title) <= 8 for _, title, *_ in rows)  # noqa: PLR2004
+    assert {user_id for *_, user_id in rows} == set(range(1, 11))
+
+
+def test_owner_rank_skew():
+    users = 100
+    uniform = Counter(owner_rank(u / 1000, users, 0) for u in range(1000))
+    skewed = Counter(owner_rank(u / 1000, users, 1.5) for u in range(1000))
+
+    assert set(uniform) == set(range(users))
+    assert max(uniform.values()) < 2 * min(uniform.values())
+    assert skewed[0] > skewed[1] > skewed[10] > skewed[50]
+    assert skewed[0] > 10 * uniform[0]
+
+
+def test_seed_command(session, client, engine, monkeypatch, capsys):
+    monkeypatch.setattr(cli, 'engine', engine)
+
+    cli.main([
+        'seed',
+        '--users', '5',
+        '--todos', '120',
+        '--batch-size', '50',
+        '--workers', '2',
+        '--statuses', 'todo=1,completed=1',
+    ])  # fmt: skip
+
+    expected_users, expected_todos = 5, 120
+    assert session.scalar(select(func.count(User.id))) == expected_users
+    assert session.scalar(select(func.count(ToDo.id))) == expected_todos
+    assert set(session.scalars(select(ToDo.status).distinct())) == {
+        ToDoStatus.todo,
+        ToDoStatus.completed,
+    }
+    assert reconcile_counts(session) == []
+    assert capsys.readouterr().out.startswith('5 users from id 1, 120 todos')
+
+    response = client.post(
+        '/v1/auth/token',
+        data={'username': 'seeded_3@example.com', 'password': PASSWORD},
+    )
+    assert response.status_code == HTTPStatus.OK
+    # The sequences moved past the seeded ids.
+    response = client.post(
+        '/v1/users/',
+        json={'username': 'new', 'email': 'new@example.com', 'password': 'p'},
+    )
+    assert response.json()['id'] == expected_users + 1
@@ -1,6 +1,15 @@
+import csv
+import io
+import json
 from http import HTTPStatus
 
-from app.models.todos import ToDoStatus
+import pytest
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.endpoints.todos import settings
+from app.models.todos import ToDo, ToDoStatus
+from app.schemas.todos import ToDoList
 from tests.conftest import ToDoFactory
 
 
@@ -51,6 +60,70 @@ def test_list_todos_pagination_should_return_2_todos(
     assert len(response.json()['todos']) == expected_todos
 
 
+def test_list_todos_cursor_pagination_walks_all_pages(
+    session, client, user, token
+):
+    session.add_all(ToDoFactory.create_batch(5, user_id=user.id))
+    session.commit()
+
+    ids = []
+    cursor = None
+    for _ in range(3):
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+
+        response = client.get(
+            '/v1/todos/',
+            params=params,
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        data = response.json()
+        ids.extend(todo['id'] for todo in data['todos'])
+        cursor = data['next_cursor']
+
+    assert ids == [1, 2, 3, 4, 5]
+    assert cursor is None
+
+
+def test_list_todos_limit_is_capped(session, client, user, token):
+    session.bulk_save_objects(
+        ToDoFactory.create_batch(
+            settings.TODOS_PAGE_SIZE_MAX + 1, user_id=user.id
+        )
+    )
+    session.commit()
+
+    response = client.get(
+        '/v1/todos/?limit=100000',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    data = response.json()
+    assert len(data['todos']) == settings.TODOS_PAGE_SIZE_MAX
+    assert data['next_cursor']
+
+
+@pytest.mark.parametrize('query', ['limit=-1', 'limit=0', 'offset=-1'])
+def test_list_todos_rejects_out_of_range_pages(client, token, query):
+    response = client.get(
+        f'/v1/todos/?{query}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_list_todos_invalid_cursor(client, token):
+    response = client.get(
+        '/v1/todos/?cursor=not-a-cursor',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Invalid cursor.'}
+
+
 def test_list_todos_filter_title_should_return_5_todos(
     session, client, user, token
 ):
@@ -133,6 +206,37 @@ def test_list_todos_filter_combined_should_return_5_todos(
     assert len(response.json()['todos']) == expected_todos
 
 
+def test_list_todos_search_ranks_by_relevance(session, client, user, token):
+    session.add_all([
+        ToDoFactory(user_id=user.id, title='Buy bread', description='bakery'),
+        ToDoFactory(user_id=user.id, title='Buy milk', description='milk'),
+        ToDoFactory(user_id=user.id, title='Walk the dog', description='park'),
+    ])
+    session.commit()
+
+    response = client.get(
+        '/v1/todos/?q=milk buy',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert [todo['title'] for todo in response.json()['todos']] == ['Buy milk']
+
+    response = client.get(
+        '/v1/todos/?q=buy&limit=1',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    data = response.json()
+    response = client.get(
+        '/v1/todos/',
+        params={'q': 'buy', 'limit': 1, 'cursor': data['next_cursor']},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    titles = {data['todos'][0]['title'], response.json()['todos'][0]['title']}
+    assert titles == {'Buy bread', 'Buy milk'}
+    assert response.json()['next_cursor'] is None
+
+
 def test_delete_todo(session, client, user, token):
     todo = ToDoFactory(user_id=user.id)
 
@@ -181,3 +285,431 @@ def test_patch_todo(session, client, user, token):
     )
     assert response.status_code == HTTPStatus.OK
     assert response.json()['title'] == 'teste!'
+
+
+def test_create_todos_batch(session, client, user, token):
+    todos = [
+        {'title': f'Todo {i}', 'description': 'batch', 'status': 'todo'}
+        for i in range(3)
+    ]
+
+    response = client.post(
+        '/v1/todos/batch',
+        json=todos,
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'todos': [{'id': i + 1, **todo} for i, todo in enumerate(todos)],
+        'errors': [],
+    }
+
+
+def test_create_todos_batch_atomic_rejects_whole_batch(client, token):
+    response = client.post(
+        '/v1/todos/batch',
+        json=[
+            {'title': 'ok', 'description': 'ok', 'status': 'todo'},
+            {'title': 'bad', 'description': 'bad', 'status': 'unknown'},
+        ],
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()['detail'][0]['loc'] == ['body', 1, 'status']
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.json()['todos'] == []
+
+
+def test_create_todos_batch_partial_reports_item_errors(client, token):
+    response = client.post(
+        '/v1/todos/batch?atomic=false',
+        json=[
+            {'title': 'bad', 'status': 'todo'},
+            {'title': 'ok', 'description': 'ok', 'status': 'todo'},
+        ],
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert [todo['title'] for todo in data['todos']] == ['ok']
+    assert data['errors'][0]['index'] == 0
+    assert data['errors'][0]['detail'][0]['loc'] == ['description']
+
+
+def test_patch_todos_bulk_by_ids(session, client, user, another_user, token):
+    todos = ToDoFactory.create_batch(3, user_id=user.id, status='todo')
+    other = ToDoFactory(user_id=another_user.id, status='todo')
+    session.add_all([*todos, other])
+    session.commit()
+
+    response = client.patch(
+        '/v1/todos/bulk',
+        json={
+            'ids': [todos[0].id, todos[1].id, other.id],
+            'changes': {'status': 'completed'},
+        },
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'count': 2,
+        'ids': [todos[0].id, todos[1].id],
+    }
+    session.expire_all()
+    assert [todo.status for todo in todos] == [
+        ToDoStatus.completed,
+        ToDoStatus.completed,
+        ToDoStatus.todo,
+    ]
+    assert other.status == ToDoStatus.todo
+
+
+def test_patch_todos_bulk_by_filter(session, client, user, token):
+    expected_count = 2
+    session.add_all([
+        *ToDoFactory.create_batch(2, user_id=user.id, status='completed'),
+        ToDoFactory(user_id=user.id, status='todo'),
+    ])
+    session.commit()
+
+    response = client.patch(
+        '/v1/todos/bulk',
+        json={
+            'filter': {'status': 'completed'},
+            'changes': {'status': 'trash'},
+        },
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.json()['count'] == expected_count
+
+
+def test_patch_todos_bulk_requires_selection_and_changes(client, token):
+    response = client.patch(
+        '/v1/todos/bulk',
+        json={'ids': [1], 'filter': {}, 'changes': {'status': 'trash'}},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+    response = client.patch(
+        '/v1/todos/bulk',
+        json={'ids': [1], 'changes': {}},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_delete_todos_bulk_by_filter(session, client, user, token):
+    session.add_all([
+        *ToDoFactory.create_batch(3, user_id=user.id, status='trash'),
+        ToDoFactory(user_id=user.id, status='todo'),
+    ])
+    session.commit()
+
+    response = client.request(
+        'DELETE',
+        '/v1/todos/bulk',
+        json={'filter': {'status': 'trash'}},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'count': 3, 'ids': [1, 2, 3]}
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert [todo['status'] for todo in response.json()['todos']] == ['todo']
+
+
+def test_patch_todo_runs_a_single_todos_statement(
+    session, client, user, token, count_queries
+):
+    expected_statements = 4
+    todo = ToDoFactory(user_id=user.id, status='todo')
+    session.add(todo)
+    session.commit()
+
+    with count_queries() as statements:
+        response = client.patch(
+            f'/v1/todos/{todo.id}',
+            json={'status': 'doing'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert response.json()['status'] == 'doing'
+    # The user lookup from get_current_user, the UPDATE, the status
+    # counters and the bump of the user's todos version.
+    assert len(statements) == expected_statements
+    assert statements[1].startswith('UPDATE todos')
+    assert statements[2].startswith('INSERT INTO todo_counters')
+    assert statements[3].startswith('UPDATE users')
+
+
+def test_delete_todo_runs_a_single_todos_statement(
+    session, client, user, token, count_queries
+):
+    expected_statements = 4
+    todo = ToDoFactory(user_id=user.id)
+    session.add(todo)
+    session.commit()
+
+    with count_queries() as statements:
+        client.delete(
+            f'/v1/todos/{todo.id}',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert len(statements) == expected_statements
+    assert statements[1].startswith('DELETE FROM todos')
+    assert statements[2].startswith('UPDATE users')
+    assert statements[3].startswith('INSERT INTO todo_counters')
+
+
+def test_export_todos_ndjson(session, client, user, token):
+    session.add_all([
+        ToDoFactory(
+            user_id=user.id, title='a', description='x', status='todo'
+        ),
+        ToDoFactory(
+            user_id=user.id, title='b', description='y', status='trash'
+        ),
+    ])
+    session.commit()
+
+    response = client.get(
+        '/v1/todos/export?status=todo',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {'id': 1, 'title': 'a', 'description': 'x', 'status': 'todo'}
+    ]
+
+
+def test_export_todos_csv(session, client, user, token):
+    session.add(
+        ToDoFactory(
+            user_id=user.id, title='a, b', description='x', status='todo'
+        )
+    )
+    session.commit()
+
+    response = client.get(
+        '/v1/todos/export?format=csv',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.headers['content-type'].startswith('text/csv')
+    assert list(csv.reader(io.StringIO(response.text))) == [
+        ['id', 'title', 'description', 'status'],
+        ['1', 'a, b', 'x', 'todo'],
+    ]
+
+
+def test_import_todos_ndjson_reports_bad_lines(client, token):
+    expected_imported = 2
+    expected_failed = 2
+    body = '\n'.join([
+        json.dumps({'title': 'a', 'description': 'x', 'status': 'todo'}),
+        '{not json',
+        json.dumps({'title': 'b', 'description': 'y', 'status': 'nope'}),
+        json.dumps({'title': 'c', 'description': 'z', 'status': 'doing'}),
+    ])
+
+    response = client.post(
+        '/v1/todos/import',
+        content=body,
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data['imported'] == expected_imported
+    assert data['failed'] == expected_failed
+    assert [error['line'] for error in data['errors']] == [2, 3]
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert [todo['title'] for todo in response.json()['todos']] == ['a', 'c']
+
+
+def test_import_todos_csv_in_chunks(client, token):
+    rows = [f'Todo {i},"multi\nline, description",todo' for i in range(5)]
+    body = 'title,description,status\n' + '\n'.join(rows)
+
+    def chunks():
+        data = body.encode()
+        for start in range(0, len(data), 7):
+            yield data[start : start + 7]
+
+    response = client.post(
+        '/v1/todos/import?format=csv',
+        content=chunks(),
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.json() == {'imported': 5, 'failed': 0, 'errors': []}
+
+    response = client.get(
+        '/v1/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.json()['todos'][0]['description'] == (
+        'multi\nline, description'
+    )
+
+
+def test_import_todos_reports_overlong_records(client, token, monkeypatch):
+    expected_imported = 4
+    monkeypatch.setattr(settings, 'TODOS_IMPORT_MAX_RECORD_LENGTH', 100)
+    body = '\n'.join([
+        'title,description,status',
+        'a,x,todo',
+        'b,' + 'y' * 200 + ',todo',
+        'c,"unterminated,todo',
+        *['d,' + 'z' * 20 + ',todo'] * 5,
+        'e,x,todo',
+    ])
+
+    response = client.post(
+        '/v1/todos/import?format=csv',
+        content=body,
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    data = response.json()
+    assert [error['line'] for error in data['errors']] == [3, 4]
+    assert data['errors'][0]['detail'][0]['msg'] == (
+        'Record longer than 100 characters'
+    )
+    # Parsing resumes after the record cut short, at line 8.
+    assert data['imported'] == expected_imported
+
+
+def test_import_todos_streams_progress(client, token, monkeypatch):
+    monkeypatch.setattr(settings, 'TODOS_IMPORT_CHUNK_SIZE', 2)
+    body = '\n'.join(
+        json.dumps({'title': str(i), 'description': 'x', 'status': 'todo'})
+        for i in range(5)
+    )
+
+    response = client.post(
+        '/v1/todos/import?progress=true',
+        content=body,
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {'imported': 2, 'failed': 0},
+        {'imported': 4, 'failed': 0},
+        {'imported': 5, 'failed': 0, 'errors': []},
+    ]
+
+
+def test_list_todos_etag_revalidation(session, client, user, token):
+    session.add(ToDoFactory(user_id=user.id))
+    session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get('/v1/todos/', headers=headers)
+    etag = response.headers['etag']
+
+    response = client.get(
+        '/v1/todos/', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not response.content
+
+    response = client.get(
+        '/v1/todos/?limit=1', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    client.patch('/v1/todos/1', json={'title': 'new'}, headers=headers)
+    response = client.get(
+        '/v1/todos/', headers={**headers, 'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['etag'] != etag
+
+
+def test_list_todos_matches_response_model_rendering(
+    session, client, user, token
+):
+    session.bulk_save_objects([
+        ToDoFactory(user_id=user.id, title='Café ☕ "quoted"'),
+        ToDoFactory(user_id=user.id, description='línea\nnueva 🚀 \\ /'),
+        *ToDoFactory.create_batch(3, user_id=user.id),
+    ])
+    session.commit()
+
+    response = client.get(
+        '/v1/todos?limit=4', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    todos = session.scalars(select(ToDo).order_by(ToDo.id).limit(4)).all()
+    next_cursor = response.json()['next_cursor']
+    expected = ToDoList.model_validate(
+        {'todos': todos, 'next_cursor': next_cursor}, from_attributes=True
+    )
+    assert next_cursor is not None
+    assert (
+        response.content == JSONResponse(expected.model_dump(mode='json')).body
+    )
+
+
+def test_list_todos_fields_selects_only_those_columns(
+    session, client, user, token, count_queries
+):
+    todo = ToDoFactory(user_id=user.id, status='todo')
+    session.add(todo)
+    session.commit()
+
+    with count_queries() as statements:
+        response = client.get(
+            '/v1/todos/?fields=status,title',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert response.json()['todos'] == [
+        {
+            'title': session.scalar(select(ToDo.title)),
+            'status': 'todo',
+            'id': 1,
+        }
+    ]
+    assert 'todos.description' not in statements[-1]
+
+
+def test_list_todos_fields_rejects_unknown_fields(client, token):
+    response = client.get(
+        '/v1/todos/?fields=title,user_id,secret',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Unknown fields: secret, user_id.'}
+
+
+def test_export_todos_csv_fields(session, client, user, token):
+    session.add(ToDoFactory(user_id=user.id, status='doing'))
+    session.commit()
+
+    response = client.get(
+        '/v1/todos/export?format=csv&fields=status',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.text == 'id,status\r\n1,doing\r\n'
@@ -1,6 +1,8 @@
 from http import HTTPStatus
 
-from app.schemas.users import UserPublic
+from fastapi.responses import JSONResponse
+
+from app.schemas.users import UserList, UserPublic
 
 
 def test_create_user(client):
@@ -21,6 +23,22 @@ def test_create_user(client):
     }
 
 
+def test_create_user_runs_a_single_statement(client, count_queries):
+    with count_queries() as statements:
+        response = client.post(
+            '/v1/users/',
+            json={
+                'username': 'scott',
+                'email': 'scott@example.com',
+                'password': 'scottGreatSecret',
+            },
+        )
+
+    assert response.status_code == HTTPStatus.CREATED
+    assert len(statements) == 1
+    assert statements[0].startswith('INSERT INTO users')
+
+
 def test_create_user_username_should_return_400(client, user):
     response = client.post(
         '/v1/users/',
@@ -74,6 +92,29 @@ def test_read_user_by_id(client, user):
     }
 
 
+def test_read_user_by_id_etag_revalidation(client, user, token):
+    etag = client.get(f'/v1/users/{user.id}').headers['etag']
+
+    response = client.get(
+        f'/v1/users/{user.id}', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    client.put(
+        f'/v1/users/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json={
+            'username': 'bob',
+            'email': 'bob@example.com',
+            'password': 'mynewpassword',
+        },
+    )
+    response = client.get(
+        f'/v1/users/{user.id}', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
 def test_read_user_by_id_should_return_404(client, user):
     mock_user_id = user.id + 1
     response = client.get(f'/v1/users/{mock_user_id}')
@@ -140,3 +181,10 @@ def test_delete_user_with_wrong_user(client, another_user, token):
 
     assert response.status_code == HTTPStatus.FORBIDDEN
     assert response.json() == {'detail': 'Not enough permission'}
+
+
+def test_read_users_matches_response_model_rendering(client, user):
+    response = client.get('/v1/users/')
+
+    expected = UserList(users=[UserPublic.model_validate(user)])
+    assert response.content == JSONResponse(expected.model_dump()).body